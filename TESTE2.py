@@ -14,15 +14,36 @@ import cv2
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize, sent_tokenize
-from sumy.parsers.plaintext import PlaintextParser
 from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
 from docx import Document
 from fpdf import FPDF
+import contextlib
 import datetime
+import hashlib
+import html
+import queue
 import random
-from collections import defaultdict
-from io import BytesIO
+import threading
+import time
+import weakref
+import zlib
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from io import BytesIO, TextIOBase, TextIOWrapper
+
+try:
+    import tesserocr
+
+    HAS_TESSEROCR = True
+except ImportError:
+    HAS_TESSEROCR = False
+
+try:
+    from scipy import sparse
+
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
 
 # Configuração do Tesseract OCR
 try:
@@ -30,10 +51,6 @@ try:
 except:
     st.warning("Configure manualmente o caminho do Tesseract nas Configurações do sistema")
 
-# Configurações iniciais
-nltk.download('punkt')
-nltk.download('stopwords')
-
 # Configuração do Streamlit
 st.set_page_config(
     page_title="EstudaZilla Ultimate v2.0",
@@ -42,135 +59,1123 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Configuração do OCR e da ingestão de PDFs
+OCR_CONFIG = r'--oem 3 --psm 6'
+OCR_LANG = 'por'
+PAGES_PER_TASK = 8
+
+# Estilos de resumo gerados pelo ContentSummarizer
+SUMMARY_STYLES = ('bullet', 'flashcard', 'dissertative', 'mindmap')
+
+# Tipos de questão gerados pelo QuizGenerator
+QUESTION_TYPES = ('multiple_choice', 'true_false', 'short_answer', 'case_study')
+
+
+OCR_CACHE_DIR = '.estudazilla_ocr_cache'
+EXPORT_CACHE_DIR = '.estudazilla_export_cache'
+
+
+class OCRPreprocessor:
+    """Pipeline configurável de pré-processamento das páginas enviadas ao OCR.
+
+    Escolhe a resolução de renderização por página, descarta páginas em
+    branco com um histograma barato e recorta a área com conteúdo antes da
+    binarização, reduzindo os pixels entregues ao Tesseract.
+
+    "Tinta" é todo pixel que se afasta mais de `contrast` níveis do fundo da
+    própria página (o tom mais comum), e não de um nível fixo: no scan em
+    baixa resolução os traços finos viram cinzas claros, e o fundo de um
+    papel digitalizado raramente é branco puro.
+    """
+
+    def __init__(self, target_dpi=300, min_dpi=100, max_pixels=12_000_000,
+                 contrast=48, blank_ratio=0.0001, margin=12, probe_dpi=72):
+        self.target_dpi = target_dpi
+        self.min_dpi = min_dpi
+        self.max_pixels = max_pixels
+        self.contrast = contrast
+        self.blank_ratio = blank_ratio
+        self.margin = margin
+        self.probe_dpi = probe_dpi
+
+    def choose_dpi(self, page):
+        """Define a resolução da página sem ultrapassar a resolução nativa das imagens"""
+        width_in = page.rect.width / 72
+        height_in = page.rect.height / 72
+        dpi = self.target_dpi
+
+        # Páginas digitalizadas: renderizar acima da resolução do scan não ajuda o OCR
+        native_dpis = [
+            image[2] / width_in
+            for image in page.get_images(full=True)
+            if width_in and image[2]
+        ]
+        if native_dpis:
+            dpi = min(dpi, max(native_dpis))
+
+        # Limita o total de pixels em páginas muito grandes
+        if width_in and height_in:
+            dpi = min(dpi, (self.max_pixels / (width_in * height_in)) ** 0.5)
+
+        return int(max(self.min_dpi, dpi))
+
+    def render(self, page, dpi=None):
+        """Renderiza a página diretamente em tons de cinza"""
+        pix = page.get_pixmap(dpi=dpi or self.choose_dpi(page), colorspace=fitz.csGRAY)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+    def _ink_levels(self, hist):
+        """Máscara dos níveis de cinza que contam como tinta, dado o histograma da página"""
+        background = int(np.argmax(hist))
+        levels = np.arange(256)
+        return np.abs(levels - background) > self.contrast
+
+    def is_blank(self, gray, step=4):
+        """Detecta páginas em branco pela fração de pixels de tinta (histograma amostrado)"""
+        sample = gray[::step, ::step]
+        hist = np.bincount(sample.ravel(), minlength=256)
+        return hist[self._ink_levels(hist)].sum() < self.blank_ratio * sample.size
+
+    def crop(self, gray):
+        """Recorta a imagem para a caixa delimitadora do conteúdo"""
+        mask = self._ink_levels(np.bincount(gray[::4, ::4].ravel(), minlength=256))[gray]
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if not len(rows) or not len(cols):
+            return gray
+
+        top = max(0, rows[0] - self.margin)
+        bottom = min(gray.shape[0], rows[-1] + self.margin + 1)
+        left = max(0, cols[0] - self.margin)
+        right = min(gray.shape[1], cols[-1] + self.margin + 1)
+        return gray[top:bottom, left:right]
+
+    def prepare(self, image):
+        """Pré-processa uma imagem e a codifica em PNG; retorna None se estiver em branco"""
+        gray = np.asarray(image)
+        if gray.ndim == 3:
+            # Pixmaps e imagens PIL são RGB, não BGR
+            gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+
+        if self.is_blank(gray):
+            return None
+
+        cropped = self.crop(gray)
+        thresh = cv2.threshold(cropped, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        return cv2.imencode('.png', thresh)[1].tobytes()
+
+    def prepare_page(self, page):
+        """Renderiza e pré-processa uma página do PyMuPDF"""
+        # Miniatura de baixa resolução evita renderizar páginas em branco em alta resolução
+        if self.is_blank(self.render(page, dpi=self.probe_dpi), step=1):
+            return None
+        return self.prepare(self.render(page))
+
+
+class TesseractBackend:
+    """OCR via pytesseract (um processo do tesseract por imagem)"""
+    name = 'tesseract'
+
+    def __init__(self, config=OCR_CONFIG, lang=OCR_LANG):
+        self.config = config
+        self.lang = lang
+
+    def recognize(self, image_bytes):
+        image = Image.open(BytesIO(image_bytes))
+        return pytesseract.image_to_string(image, config=self.config, lang=self.lang)
+
+
+class TesserocrBackend:
+    """OCR via tesserocr, mantendo uma instância do Tesseract viva por thread"""
+    name = 'tesserocr'
+
+    def __init__(self, lang=OCR_LANG, psm=6, oem=3):
+        self.config = f'--oem {oem} --psm {psm}'
+        self.lang = lang
+        self.psm = psm
+        self.oem = oem
+        self._local = threading.local()
+
+    def recognize(self, image_bytes):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            # tesserocr.PSM e tesserocr.OEM são só constantes inteiras
+            api = tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm, oem=self.oem)
+            self._local.api = api
+        api.SetImage(Image.open(BytesIO(image_bytes)))
+        return api.GetUTF8Text()
+
+
+class FakeOCRBackend:
+    """Backend local que substitui o Tesseract em testes"""
+    name = 'fake'
+
+    def __init__(self, text="Texto reconhecido", config=OCR_CONFIG, lang=OCR_LANG):
+        self.text = text
+        self.config = config
+        self.lang = lang
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def recognize(self, image_bytes):
+        with self._lock:
+            self.calls += 1
+        return self.text
+
+
+def default_ocr_backend():
+    """Usa o tesserocr (Tesseract persistente) quando disponível"""
+    return TesserocrBackend() if HAS_TESSEROCR else TesseractBackend()
+
+
+class OCRService:
+    """Pool limitado de workers de OCR de longa duração com cache em disco.
+
+    As imagens das páginas entram em uma fila limitada como bytes (PNG) e
+    cada resultado fica em disco, indexado pelo hash da imagem mais a
+    configuração do OCR, para que uploads repetidos não refaçam o OCR.
+    """
+
+    def __init__(self, backend=None, workers=2, cache_dir=OCR_CACHE_DIR, max_queue=64):
+        self.backend = backend or default_ocr_backend()
+        self.cache_dir = cache_dir
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = []
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        for i in range(max(1, workers)):
+            worker = threading.Thread(target=self._worker_loop, name=f"ocr-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def cache_key(self, image_bytes):
+        """Chave do cache: hash da imagem + backend + configuração do OCR"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(f"|{self.backend.name}|{self.backend.config}|{self.backend.lang}".encode())
+        return digest.hexdigest()
+
+    def submit(self, image_bytes):
+        """Enfileira uma imagem e retorna um Future com {'text', 'elapsed', 'cached'}"""
+        future = Future()
+        key = self.cache_key(image_bytes)
+
+        cached = self._read_cache(key)
+        if cached is not None:
+            future.set_result({'text': cached, 'elapsed': 0.0, 'cached': True})
+        else:
+            # Bloqueia quando a fila está cheia, limitando a memória usada
+            self._queue.put((key, image_bytes, future))
+        return future
+
+    def recognize_many(self, images):
+        """Reconhece várias imagens, devolvendo os textos na ordem de entrada"""
+        futures = [self.submit(image_bytes) for image_bytes in images]
+        return [future.result()['text'] for future in futures]
+
+    def shutdown(self):
+        """Encerra os workers após esvaziar a fila"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            key, image_bytes, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.perf_counter()
+            try:
+                text = self.backend.recognize(image_bytes)
+                self._write_cache(key, text)
+                future.set_result({'text': text, 'elapsed': time.perf_counter() - started, 'cached': False})
+            except Exception as e:
+                future.set_exception(e)
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def _read_cache(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cache(self, key, text):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Escrita atômica: outro worker nunca lê um arquivo pela metade
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def _normalize_line(line):
+    return ' '.join(line.split())
+
+
+def _large_font_lines(page, ratio=1.2):
+    """Linhas da página com fonte maior que a mediana (pistas de título)"""
+    lines = page.extract_text_lines(return_chars=True)
+    sizes = [char['size'] for line in lines for char in line['chars']]
+    if not sizes:
+        return []
+
+    threshold = float(np.median(sizes)) * ratio
+    return [
+        _normalize_line(line['text'])
+        for line in lines
+        if line['chars'] and max(char['size'] for char in line['chars']) >= threshold
+    ]
+
+
+def _extract_page_range(file_path, page_indices, preprocessor=None):
+    """Extrai as páginas indicadas em uma única passagem por página.
+
+    O pixmap só é renderizado quando a página não possui texto extraível; a
+    imagem pré-processada é devolvida em 'image' para o OCRService e páginas
+    em branco são marcadas como 'blank' sem passar pelo OCR.
+    """
+    preprocessor = preprocessor or OCRPreprocessor()
+    results = []
+    doc = fitz.open(file_path)
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            for page_index in page_indices:
+                started = time.perf_counter()
+                result = {
+                    'page': page_index + 1, 'text': '', 'source': 'text',
+                    'error': None, 'image': None, 'large_lines': None
+                }
+
+                page = pdf.pages[page_index]
+                text = page.extract_text() or ''
+                if text.strip() and HEADING_HINT.search(text):
+                    # Só calcula os tamanhos de fonte quando há candidatos a título
+                    result['large_lines'] = _large_font_lines(page)
+                page.flush_cache()
+
+                if text.strip():
+                    result['text'] = text
+                else:
+                    # Página sem texto: provavelmente digitalizada, segue para o OCR
+                    try:
+                        result['image'] = preprocessor.prepare_page(doc.load_page(page_index))
+                        result['source'] = 'ocr' if result['image'] else 'blank'
+                    except Exception as e:
+                        result['source'] = 'ocr'
+                        result['error'] = str(e)
+
+                result['elapsed'] = time.perf_counter() - started
+                results.append(result)
+    finally:
+        doc.close()
+    return results
+
+
+def file_digest(data):
+    """Calcula o SHA-256 do conteúdo de um arquivo"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def page_fingerprints(doc):
+    """Calcula uma impressão digital por página sem renderizar nem extrair texto.
+
+    Combina o fluxo de conteúdo da página, as fontes e os fluxos brutos das
+    imagens, de modo que uma revisão do PDF só altere as páginas modificadas.
+    """
+    fingerprints = []
+    for page in doc:
+        digest = hashlib.sha256()
+        digest.update(repr(tuple(page.rect)).encode())
+        digest.update(page.read_contents())
+        for font in page.get_fonts():
+            digest.update(repr(font[1:]).encode())
+        for image in page.get_images(full=True):
+            digest.update(doc.xref_stream_raw(image[0]) or b'')
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+HEADING_HINT = re.compile(
+    r'^[ \t]*(?:CAP[ÍI]TULO|CHAPTER|SUB-?TEMA|SUBTOPIC|TEMA|TOPIC)[ \t]*\d', re.IGNORECASE | re.MULTILINE
+)
+
+
+class HeadingDetector:
+    """Detecta capítulos, temas e subtemas linha a linha.
+
+    Os padrões são compilados uma única vez. Quando a página traz tamanhos
+    de fonte (texto nativo), só linhas em fonte maior que o corpo contam
+    como título, evitando falsos positivos no meio de parágrafos.
+    """
+
+    PATTERNS = (
+        (1, re.compile(r'^\s*(?:CAP[ÍI]TULO|CHAPTER)\s*(\d+)\s*(?:[.:\-–]\s*(.*))?$', re.IGNORECASE)),
+        (3, re.compile(r'^\s*(?:SUB-?TEMA|SUBTOPIC)\s*(\d+)\s*(?:[.:\-–]\s*(.*))?$', re.IGNORECASE)),
+        (2, re.compile(r'^\s*(?:TEMA|TOPIC)\s*(\d+)\s*(?:[.:\-–]\s*(.*))?$', re.IGNORECASE)),
+    )
+
+    def __init__(self, use_font_cues=True, max_title_length=150):
+        self.use_font_cues = use_font_cues
+        self.max_title_length = max_title_length
+
+    def find_headings(self, text, large_lines=None):
+        """Retorna [(nível, título, offset)] dos títulos encontrados na página"""
+        if not HEADING_HINT.search(text):
+            return []
+
+        large = set(large_lines or []) if self.use_font_cues else set()
+        lines = text.splitlines(keepends=True)
+        headings = []
+        offset = 0
+
+        for i, line in enumerate(lines):
+            heading = self._match(line)
+            if heading:
+                level, title = heading
+                title_line = ''
+                if not title:
+                    # "CAPÍTULO 1" sozinho: o título está na próxima linha não vazia
+                    title_line = next((l for l in lines[i + 1:] if l.strip()), '')
+                    title = title_line.strip()
+
+                if title and self._has_heading_font(line, title_line, large):
+                    headings.append((level, title[:self.max_title_length], offset))
+            offset += len(line)
+
+        return headings
+
+    def _match(self, line):
+        if len(line) > self.max_title_length + 20:
+            return None
+        for level, pattern in self.PATTERNS:
+            match = pattern.match(line.rstrip('\r\n'))
+            if match:
+                return level, (match.group(2) or '').strip()
+        return None
+
+    def _has_heading_font(self, line, title_line, large):
+        # Sem informação de fonte (OCR ou fonte uniforme): aceita o padrão
+        if not large:
+            return True
+        return _normalize_line(line) in large or _normalize_line(title_line) in large
+
+
+def section_labels(block):
+    """Rótulos de capítulo, tema e subtema de um bloco, com os valores padrão"""
+    return (
+        block['chapter'] or "Sem Capítulo",
+        block['theme'] or "Sem Tema",
+        block['subtheme'] or "Sem Subtema"
+    )
+
+
+def structure_blocks(blocks):
+    """Estrutura blocos extraídos em capítulos, temas e subtemas"""
+    structured = {
+        'chapters': defaultdict(lambda: {
+            'themes': defaultdict(lambda: {
+                'subthemes': defaultdict(list)
+            })
+        })
+    }
+
+    for block in blocks:
+        chapter, theme, subtheme = section_labels(block)
+        structured['chapters'][chapter]['themes'][theme]['subthemes'][subtheme].append({
+            'page': block['page'],
+            'text': block['text']
+        })
+
+    return structured
+
+
+# Palavras vazias usadas quando o corpus do NLTK não está instalado
+FALLBACK_STOPWORDS = frozenset('''
+a à ao aos as às com como da das de del dela dele deles do dos e é em entre era essa esse esta está
+este eu foi for foram há isso isto já la lhe mais mas me mesmo meu minha muito na nas não nem no
+nos nós o os ou para pela pelas pelo pelos por qual quando que quem se sem ser seu seus só sua suas
+também te tem têm um uma umas uns você vocês
+'''.split())
+
+
+class _RegexTokenizer:
+    """Tokenizador compatível com o sumy para quando o punkt não está disponível"""
+    SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+(?=[A-ZÀ-Ý0-9"“(])')
+    WORD = re.compile(r'\w+', re.UNICODE)
+
+    def __init__(self, language='portuguese'):
+        self.language = language
+
+    def to_sentences(self, paragraph):
+        return [sentence.strip() for sentence in self.SENTENCE_SPLIT.split(paragraph) if sentence.strip()]
+
+    def to_words(self, sentence):
+        return self.WORD.findall(sentence)
+
+
+class NLPResources:
+    """Recursos de NLP carregados sob demanda, uma vez por processo.
+
+    Nunca acessa a rede na inicialização: os corpora do NLTK são procurados
+    localmente e, se faltarem, usa-se um tokenizador por expressões regulares
+    e uma lista interna de palavras vazias. O download é explícito
+    (download_missing). Tokenizador e sumarizador são compartilhados pelas
+    sessões, pois não guardam estado entre chamadas.
+    """
+
+    LANGUAGE = 'portuguese'
+    # O NLTK 3.9+ (e o Tokenizer do sumy) só leem o punkt_tab; o pickle antigo do punkt não basta
+    RESOURCES = {
+        'punkt': ('tokenizers/punkt_tab/portuguese',),
+        'stopwords': ('corpora/stopwords',),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    def _get(self, name, loader):
+        value = self._loaded.get(name)
+        if value is None:
+            with self._lock:
+                value = self._loaded.get(name)
+                if value is None:
+                    value = loader()
+                    self._loaded[name] = value
+        return value
+
+    def has_resource(self, name):
+        """Verifica se o recurso do NLTK está instalado localmente"""
+        for path in self.RESOURCES[name]:
+            try:
+                nltk.data.find(path)
+                return True
+            except LookupError:
+                continue
+        return False
+
+    def missing_resources(self):
+        return [name for name in self.RESOURCES if not self.has_resource(name)]
+
+    def download_missing(self):
+        """Baixa os recursos ausentes (chamado apenas por ação do usuário)"""
+        for name in self.missing_resources():
+            nltk.download('punkt_tab' if name == 'punkt' else name, quiet=True)
+        with self._lock:
+            self._loaded.clear()
+
+    @property
+    def stop_words(self):
+        return self._get('stop_words', self._load_stop_words)
+
+    @property
+    def tokenizer(self):
+        """Tokenizador do sumy (punkt) ou o alternativo por expressões regulares"""
+        return self._get('tokenizer', self._load_tokenizer)
+
+    @property
+    def lsa_summarizer(self):
+        return self._get('lsa_summarizer', lambda: LSASummarizer(self.stop_words))
+
+    def sent_tokenize(self, text):
+        if self._has_punkt():
+            try:
+                return sent_tokenize(text, language=self.LANGUAGE)
+            except LookupError:
+                self._disable_punkt()
+        return self.tokenizer.to_sentences(text)
+
+    def word_tokenize(self, text):
+        if self._has_punkt():
+            try:
+                return word_tokenize(text, language=self.LANGUAGE)
+            except LookupError:
+                self._disable_punkt()
+        return _RegexTokenizer.WORD.findall(text)
+
+    def _has_punkt(self):
+        return self._get('punkt', lambda: self.has_resource('punkt'))
+
+    def _disable_punkt(self):
+        # Recurso presente mas ilegível para esta versão do NLTK: passa a usar as expressões regulares
+        with self._lock:
+            self._loaded['punkt'] = False
+
+    def _load_stop_words(self):
+        if self.has_resource('stopwords'):
+            return frozenset(stopwords.words(self.LANGUAGE))
+        return FALLBACK_STOPWORDS
+
+    def _load_tokenizer(self):
+        try:
+            return Tokenizer(self.LANGUAGE)
+        except LookupError:
+            return _RegexTokenizer(self.LANGUAGE)
+
+
+nlp = NLPResources()
+
+
 # Classes do sistema
 class PDFProcessor:
-    def __init__(self):
-        self.text_blocks = []
-        self.current_chapter = ""
-        self.current_theme = ""
-        self.current_subtheme = ""
+    """Extrator de PDFs reutilizável.
+
+    Guarda apenas a configuração (processos, OCR e pré-processamento); o
+    estado de cada arquivo vive em um DocumentExtraction próprio, então a
+    mesma instância pode processar vários documentos, inclusive em paralelo.
+    """
+
+    def __init__(self, workers=None, ocr_service=None, preprocessor=None, heading_detector=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.ocr_service = ocr_service
+        self.preprocessor = preprocessor or OCRPreprocessor()
+        self.heading_detector = heading_detector or HeadingDetector()
+
+    def extract(self, file_path, page_cache=None):
+        """Cria a extração de um documento (os blocos são gerados sob demanda)"""
+        return DocumentExtraction(self, file_path, page_cache)
 
-    def process_pdf(self, file_path):
-        """Processa um arquivo PDF, extraindo texto e imagens"""
+    def process_pdf(self, file_path, page_cache=None):
+        """Processa um arquivo PDF, extraindo texto e imagens.
+
+        Se `page_cache` for informado (ex.: DatabaseManager), as páginas cuja
+        impressão digital já foi extraída antes são reaproveitadas.
+        """
         try:
-            # Primeira passagem com pdfplumber para texto
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        self._process_text_block(text, page_num + 1)
-
-            # Segunda passagem com PyMuPDF para OCR em imagens
-            doc = fitz.open(file_path)
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-                # Verifica se a página é principalmente imagem
-                if len(self.text_blocks) == 0 or page_num + 1 > len(self.text_blocks) or not self.text_blocks[page_num][
-                    'text'].strip():
-                    text = self._ocr_image(img)
-                    if text.strip():
-                        self._process_text_block(text, page_num + 1)
-
-            return self._structure_content()
+            extraction = self.extract(file_path, page_cache)
+            structured = structure_blocks(extraction.iter_blocks())
+
+            for page_num, error in extraction.errors:
+                st.warning(f"Erro no OCR (página {page_num}): {error}")
+
+            return structured
         except Exception as e:
             st.error(f"Erro ao processar PDF: {str(e)}")
             return None
 
-    def _process_text_block(self, text, page_num):
-        """Processa um bloco de texto, identificando estrutura"""
-        # Identifica capítulos, temas e subtemas
-        chapter_match = re.search(r'(CAP[ÍI]TULO|CHAPTER)\s*(\d+)[.:]\s*(.+)', text, re.IGNORECASE)
-        theme_match = re.search(r'(TEMA|TOPIC)\s*(\d+)[.:]\s*(.+)', text, re.IGNORECASE)
-        subtheme_match = re.search(r'(SUB?TEMA|SUBTOPIC)\s*(\d+)[.:]\s*(.+)', text, re.IGNORECASE)
-
-        if chapter_match:
-            self.current_chapter = chapter_match.group(3).strip()
-            self.current_theme = ""
-            self.current_subtheme = ""
-        elif theme_match:
-            self.current_theme = theme_match.group(3).strip()
-            self.current_subtheme = ""
-        elif subtheme_match:
-            self.current_subtheme = subtheme_match.group(3).strip()
-
-        # Adiciona o bloco de texto
-        self.text_blocks.append({
+
+class DocumentExtraction:
+    """Estado da extração de um único documento"""
+
+    def __init__(self, processor, file_path, page_cache=None):
+        self.processor = processor
+        self.file_path = file_path
+        self.page_cache = page_cache
+        self.current_chapter = ""
+        self.current_theme = ""
+        self.current_subtheme = ""
+        self.page_timings = []
+        self.page_count = 0
+        self.errors = []
+        self.outline = []
+
+    def iter_blocks(self):
+        """Gera os blocos estruturados página a página, assim que são extraídos.
+
+        Uma página com um título no meio é dividida em dois blocos, e cada
+        início de seção é registrado em `outline` como (nível, título, página,
+        offset) junto com os rótulos da seção.
+        """
+        for page in self.iter_pages():
+            if page['error']:
+                self.errors.append((page['page'], page['error']))
+            if page['text'].strip():
+                yield from self._split_page(page['text'], page['page'], page['large_lines'])
+
+    def iter_pages(self):
+        """Extrai as páginas no pool de processos e as gera na ordem original.
+
+        Apenas um número limitado de lotes fica em andamento ao mesmo tempo,
+        mantendo a memória constante mesmo em PDFs muito grandes.
+        """
+        processor = self.processor
+        file_path = self.file_path
+        page_cache = self.page_cache
+
+        with fitz.open(file_path) as doc:
+            fingerprints = page_fingerprints(doc)
+
+        self.page_count = len(fingerprints)
+        self.page_timings = []
+
+        cached = page_cache.get_cached_pages(fingerprints) if page_cache else {}
+        ready = {}
+        for page_index, fingerprint in enumerate(fingerprints):
+            if fingerprint in cached:
+                ready[page_index] = {
+                    'page': page_index + 1,
+                    'text': cached[fingerprint]['text'],
+                    'source': 'cache',
+                    'error': None,
+                    'image': None,
+                    'large_lines': cached[fingerprint]['large_lines'],
+                    'elapsed': 0.0
+                }
+
+        # Apenas as páginas novas ou alteradas são extraídas
+        missing = [page_index for page_index in range(len(fingerprints)) if page_index not in ready]
+        batches = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+
+        pool = None
+        if processor.workers > 1 and len(batches) > 1:
+            pool = ProcessPoolExecutor(max_workers=min(processor.workers, len(batches)))
+        owned_service = None
+
+        try:
+            pending = deque()
+            next_batch = 0
+            next_index = 0
+
+            while next_index < len(fingerprints):
+                # Mantém até 2 lotes por processo em andamento
+                while next_batch < len(batches) and len(pending) < 2 * processor.workers:
+                    batch = batches[next_batch]
+                    if pool:
+                        pending.append(pool.submit(_extract_page_range, file_path, batch, processor.preprocessor))
+                    else:
+                        pending.append(batch)
+                    next_batch += 1
+
+                if next_index not in ready:
+                    task = pending.popleft()
+                    chunk = task.result() if pool else _extract_page_range(file_path, task, processor.preprocessor)
+                    ocr_pages = [page for page in chunk if page['image']]
+                    if ocr_pages:
+                        if not processor.ocr_service and not owned_service:
+                            owned_service = OCRService()
+                        self._run_ocr(ocr_pages, processor.ocr_service or owned_service)
+
+                    if page_cache:
+                        page_cache.save_cached_pages([
+                            (fingerprints[page['page'] - 1], page['text'], page['source'], page['large_lines'])
+                            # Páginas em branco não vão para o cache: se o teste de página
+                            # em branco mudar, um novo upload volta a examiná-las
+                            for page in chunk if not page['error'] and page['source'] != 'blank'
+                        ])
+                    for page in chunk:
+                        ready[page['page'] - 1] = page
+
+                # Entrega em ordem todas as páginas já disponíveis
+                while next_index in ready:
+                    page = ready.pop(next_index)
+                    self.page_timings.append(
+                        {'page': page['page'], 'source': page['source'], 'elapsed': page['elapsed']}
+                    )
+                    yield page
+                    next_index += 1
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+            if owned_service:
+                owned_service.shutdown()
+
+    def _run_ocr(self, pages, service):
+        """Envia as imagens das páginas ao OCRService e preenche o texto reconhecido"""
+        futures = [(page, service.submit(page.pop('image'))) for page in pages]
+        for page, future in futures:
+            try:
+                result = future.result()
+                page['text'] = result['text']
+                page['elapsed'] += result['elapsed']
+            except Exception as e:
+                page['error'] = str(e)
+
+    def _split_page(self, text, page_num, large_lines=None):
+        """Divide a página nos títulos detectados, atualizando a hierarquia atual"""
+        headings = self.processor.heading_detector.find_headings(text, large_lines)
+        start = 0
+        level, title = 0, ""
+
+        for heading_level, heading_title, offset in headings:
+            # Títulos consecutivos sem conteúdo entre eles não geram blocos vazios
+            if text[start:offset].strip():
+                yield self._make_block(text[start:offset], page_num, start, level, title)
+                start = offset
+
+            if heading_level == 1:
+                self.current_chapter = heading_title
+                self.current_theme = ""
+                self.current_subtheme = ""
+            elif heading_level == 2:
+                self.current_theme = heading_title
+                self.current_subtheme = ""
+            else:
+                self.current_subtheme = heading_title
+            level, title = heading_level, heading_title
+
+        if text[start:].strip():
+            yield self._make_block(text[start:], page_num, start, level, title)
+
+    def _make_block(self, text, page_num, offset, level, title):
+        block = {
             'page': page_num,
+            'offset': offset,
             'chapter': self.current_chapter,
             'theme': self.current_theme,
             'subtheme': self.current_subtheme,
             'text': text
-        })
-
-    def _ocr_image(self, image):
-        """Realiza OCR em uma imagem"""
-        try:
-            # Pré-processamento da imagem com OpenCV
-            img_array = np.array(image)
-            gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-            # OCR com Tesseract
-            custom_config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(thresh, config=custom_config, lang='por')
-            return text
-        except Exception as e:
-            st.warning(f"Erro no OCR: {str(e)}")
-            return ""
+        }
 
-    def _structure_content(self):
-        """Estrutura o conteúdo extraído em um formato organizado"""
-        structured = {
-            'chapters': defaultdict(lambda: {
-                'themes': defaultdict(lambda: {
-                    'subthemes': defaultdict(list)
-                })
+        labels = section_labels(block)
+        if not self.outline or self.outline[-1]['labels'] != labels:
+            if not title:
+                # Conteúdo antes do primeiro título do documento
+                level, title = 0, labels[0]
+            self.outline.append({
+                'level': level,
+                'title': title,
+                'page': page_num,
+                'offset': offset,
+                'labels': labels
             })
-        }
 
-        for block in self.text_blocks:
-            chapter = block['chapter'] or "Sem Capítulo"
-            theme = block['theme'] or "Sem Tema"
-            subtheme = block['subtheme'] or "Sem Subtema"
+        return block
+
+
+class TokenizedDocument:
+    """Representação tokenizada de um documento, construída uma única vez.
+
+    As frases ficam em um vetor plano, com o bloco de origem (content_id) e
+    as posições de início e fim no texto do bloco. As palavras (minúsculas,
+    só alfanuméricas) ficam em uma lista plana, e token_starts indica onde
+    começam as palavras de cada frase.
+    """
+
+    def __init__(self, sentences, content_ids, starts, ends, tokens, token_starts):
+        self.sentences = sentences
+        self.content_ids = np.asarray(content_ids, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.tokens = tokens
+        self.token_starts = np.asarray(token_starts, dtype=np.int64)
+
+    @classmethod
+    def build(cls, blocks):
+        """Tokeniza blocos (content_id, texto) em uma única passagem"""
+        sentences, content_ids, starts, ends, tokens, token_starts = [], [], [], [], [], [0]
+
+        for content_id, text in blocks:
+            cursor = 0
+            for sentence in nlp.sent_tokenize(text):
+                start = text.find(sentence, cursor)
+                if start < 0:
+                    start = cursor
+                end = start + len(sentence)
+                cursor = end
+
+                sentences.append(sentence)
+                content_ids.append(content_id)
+                starts.append(start)
+                ends.append(end)
+                tokens.extend(word for word in nlp.word_tokenize(sentence.lower()) if word.isalnum())
+                token_starts.append(len(tokens))
+
+        return cls(sentences, content_ids, starts, ends, tokens, token_starts)
+
+    @classmethod
+    def from_text(cls, text, content_id=0):
+        return cls.build([(content_id, text)])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Reconstrói o documento a partir das linhas (content_id, dados JSON) do banco"""
+        sentences, content_ids, starts, ends, tokens, token_starts = [], [], [], [], [], [0]
+
+        for content_id, data in rows:
+            data = json.loads(data)
+            for sentence, start, end, words in zip(data['sentences'], data['starts'], data['ends'], data['tokens']):
+                sentences.append(sentence)
+                content_ids.append(content_id)
+                starts.append(start)
+                ends.append(end)
+                tokens.extend(words)
+                token_starts.append(len(tokens))
+
+        return cls(sentences, content_ids, starts, ends, tokens, token_starts)
+
+    def to_rows(self):
+        """Serializa por bloco: [(content_id, dados JSON)]"""
+        rows = []
+        for content_id in dict.fromkeys(self.content_ids.tolist()):
+            indices = np.flatnonzero(self.content_ids == content_id)
+            rows.append((content_id, json.dumps({
+                'sentences': [self.sentences[i] for i in indices],
+                'starts': self.starts[indices].tolist(),
+                'ends': self.ends[indices].tolist(),
+                'tokens': [self.sentence_tokens(i) for i in indices]
+            }, ensure_ascii=False)))
+        return rows
+
+    def sentence_tokens(self, index):
+        """Palavras da frase `index`"""
+        return self.tokens[self.token_starts[index]:self.token_starts[index + 1]]
+
+    def for_content(self, content_id):
+        """Subdocumento com as frases de um único bloco"""
+        return self.select([content_id])
+
+    def select(self, content_ids):
+        """Subdocumento com as frases dos blocos indicados, na ordem original"""
+        indices = np.flatnonzero(np.isin(self.content_ids, content_ids))
+        tokens, token_starts = [], [0]
+        for i in indices:
+            tokens.extend(self.sentence_tokens(i))
+            token_starts.append(len(tokens))
+        return TokenizedDocument(
+            [self.sentences[i] for i in indices],
+            self.content_ids[indices], self.starts[indices], self.ends[indices],
+            tokens, token_starts
+        )
+
+    def term_counts(self, stop_words=frozenset()):
+        """Frequência de cada termo por bloco: [(content_id, termo, tf)], sem palavras vazias"""
+        if not self.tokens:
+            return []
+
+        owners = np.repeat(self.content_ids, np.diff(self.token_starts))
+        vocabulary, term_ids = np.unique(np.array(self.tokens, dtype=str), return_inverse=True)
+        keep = ~np.isin(vocabulary, np.array(sorted(stop_words), dtype=str))[term_ids]
+        blocks, block_ids = np.unique(owners[keep], return_inverse=True)
+
+        keys, counts = np.unique(block_ids * len(vocabulary) + term_ids[keep], return_counts=True)
+        return list(zip(
+            blocks[keys // len(vocabulary)].tolist(),
+            vocabulary[keys % len(vocabulary)].tolist(),
+            counts.tolist()
+        ))
+
+    def __len__(self):
+        return len(self.sentences)
 
-            structured['chapters'][chapter]['themes'][theme]['subthemes'][subtheme].append({
-                'page': block['page'],
-                'text': block['text']
-            })
 
-        return structured
+def top_keywords(scores, num_keywords):
+    """Os termos de maior pontuação (empates em ordem alfabética)"""
+    return [term for term, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:num_keywords]]
+
+
+class TermWeights:
+    """Pesos IDF dos termos de um documento, lidos do índice de termos.
+
+    Permite calcular palavras-chave por TF-IDF sem acesso ao banco, por
+    exemplo nos processos do DocumentSummaryPipeline. Tem a mesma interface
+    keywords(tokens, n) do DatabaseManager.
+    """
+
+    def __init__(self, idf, default=1.0):
+        self.idf = idf
+        self.default = default
+
+    def keywords(self, tokens, num_keywords=5):
+        counts = Counter(term for term in tokens.tokens if term not in nlp.stop_words)
+        return top_keywords(
+            {term: tf * self.idf.get(term, self.default) for term, tf in counts.items()}, num_keywords
+        )
+
+
+class LSASummarizer:
+    """Sumarização por LSA sobre uma matriz TF-IDF termo × frase esparsa.
+
+    A matriz é montada de forma vetorizada a partir de um TokenizedDocument
+    (esparsa com SciPy, densa sem ele) e apenas os `components` primeiros
+    vetores singulares são calculados, por SVD aleatorizada. A pontuação de
+    cada frase é o comprimento do seu vetor no espaço latente ponderado
+    pelos valores singulares (Steinberger & Ježek). summarize_many processa
+    vários documentos com um único vocabulário.
+
+    Com weighting='sumy' e components=None a matriz e a pontuação seguem as
+    do LsaSummarizer do sumy (TF normalizado pelo máximo da frase com
+    suavização 0,4 em todas as células e todos os componentes); esse modo é
+    denso e serve para comparar os dois no benchmark_lsa.py.
+    """
+
+    def __init__(self, stop_words=frozenset(), components=5, oversample=10, power_iterations=2, seed=0,
+                 weighting='tfidf'):
+        self.stop_words = np.array(sorted(stop_words), dtype=str)
+        self.components = components
+        self.weighting = weighting
+        self.oversample = oversample
+        self.power_iterations = power_iterations
+        self.seed = seed
+
+    def __call__(self, document, sentences_count):
+        """Retorna as `sentences_count` frases mais relevantes, na ordem do texto"""
+        return self.summarize_many([document], sentences_count)[0]
+
+    def summarize_many(self, documents, sentences_count):
+        """Resume vários documentos (TokenizedDocument) de uma vez"""
+        sentence_counts = np.array([len(document) for document in documents], dtype=np.int64)
+        term_ids, sentence_ids, vocabulary_size = self._index_terms(documents)
+        doc_offsets = np.concatenate(([0], np.cumsum(sentence_counts)))
+
+        # Pares (frase, termo) únicos com sua frequência, ordenados por frase
+        keys, counts = np.unique(sentence_ids * vocabulary_size + term_ids, return_counts=True)
+        pair_sentences = keys // max(vocabulary_size, 1)
+        pair_terms = keys % max(vocabulary_size, 1)
+        bounds = np.searchsorted(pair_sentences, doc_offsets)
+
+        summaries = []
+        for i, document in enumerate(documents):
+            if len(document) <= sentences_count:
+                summaries.append(list(document.sentences))
+                continue
+
+            start, end = bounds[i], bounds[i + 1]
+            ranks = self.rank(
+                pair_terms[start:end], pair_sentences[start:end] - doc_offsets[i],
+                counts[start:end], len(document)
+            )
+            best = np.sort(np.argsort(-ranks, kind='stable')[:sentences_count])
+            summaries.append([document.sentences[j] for j in best])
+
+        return summaries
+
+    def summarize_text(self, text, sentences_count):
+        return self(TokenizedDocument.from_text(text), sentences_count)
+
+    def rank(self, terms, sentences, counts, sentence_count):
+        """Pontua as frases de um documento a partir dos pares (termo, frase, contagem)"""
+        if not len(terms):
+            return np.zeros(sentence_count)
+
+        # Renumera os termos do documento para uma matriz compacta
+        vocabulary, terms = np.unique(terms, return_inverse=True)
+        shape = (len(vocabulary), sentence_count)
+        if self.weighting == 'sumy':
+            matrix = self._smoothed_tf_matrix(terms, sentences, counts, shape)
+        else:
+            matrix = self._tfidf_matrix(terms, sentences, counts, shape)
+
+        sigma, vt = self._top_components(matrix, min(self.components or min(shape), *shape))
+        return np.sqrt(((sigma[:, None] * vt) ** 2).sum(axis=0))
+
+    def _index_terms(self, documents):
+        """Mapeia as palavras de todos os documentos para ids de termo (sem palavras vazias)"""
+        tokens = [token for document in documents for token in document.tokens]
+        lengths = np.concatenate([np.diff(document.token_starts) for document in documents] or [[]])
+        sentence_ids = np.repeat(np.arange(len(lengths)), lengths.astype(np.int64))
+        if not tokens:
+            return np.zeros(0, dtype=np.int64), sentence_ids, 0
+
+        vocabulary, term_ids = np.unique(np.array(tokens, dtype=str), return_inverse=True)
+        keep = ~np.isin(vocabulary, self.stop_words)[term_ids]
+        return term_ids[keep], sentence_ids[keep], len(vocabulary)
+
+    def _tfidf_matrix(self, terms, sentences, counts, shape):
+        tf = 1.0 + np.log(counts)
+        df = np.bincount(terms, minlength=shape[0])
+        idf = np.log((1.0 + shape[1]) / (1.0 + df)) + 1.0
+        values = tf * idf[terms]
+
+        # Normaliza cada frase (coluna) para que frases longas não dominem
+        norms = np.sqrt(np.bincount(sentences, weights=values ** 2, minlength=shape[1]))
+        values /= norms[sentences]
+
+        if HAS_SCIPY:
+            return sparse.csr_matrix((values, (terms, sentences)), shape=shape)
+        matrix = np.zeros(shape)
+        matrix[terms, sentences] = values
+        return matrix
+
+    @staticmethod
+    def _smoothed_tf_matrix(terms, sentences, counts, shape, smooth=0.4):
+        """Matriz densa do sumy: smooth + (1 - smooth) * tf / tf máximo da frase"""
+        max_counts = np.zeros(shape[1])
+        np.maximum.at(max_counts, sentences, counts)
+        matrix = np.zeros(shape)
+        matrix[terms, sentences] = counts / max_counts[sentences]
+        matrix[:, max_counts > 0] = smooth + (1.0 - smooth) * matrix[:, max_counts > 0]
+        return matrix
+
+    def _top_components(self, matrix, k):
+        """Valores singulares e vetores singulares à direita (frases) dos k primeiros componentes"""
+        if min(matrix.shape) <= k + self.oversample:
+            dense = matrix.toarray() if hasattr(matrix, 'toarray') else matrix
+            _, sigma, vt = np.linalg.svd(dense, full_matrices=False)
+            return sigma[:k], vt[:k]
+
+        # SVD aleatorizada (Halko, Martinsson e Tropp) com iterações de potência
+        rng = np.random.default_rng(self.seed)
+        basis = matrix @ rng.standard_normal((matrix.shape[1], k + self.oversample))
+        for _ in range(self.power_iterations):
+            basis, _ = np.linalg.qr(basis)
+            basis, _ = np.linalg.qr(matrix.T @ basis)
+            basis = matrix @ basis
+        basis, _ = np.linalg.qr(basis)
+
+        _, sigma, vt = np.linalg.svd((matrix.T @ basis).T, full_matrices=False)
+        return sigma[:k], vt[:k]
 
 
 class ContentSummarizer:
-    def __init__(self):
-        self.stop_words = set(stopwords.words('portuguese'))
+    def __init__(self, cache=None, term_index=None):
+        self.stop_words = nlp.stop_words
+        self.cache = cache
+        self.term_index = term_index
+
+    def generate_summary(self, text, style='bullet', sentences_count=5, tokens=None):
+        """Gera um resumo do texto no estilo especificado.
 
-    def generate_summary(self, text, style='bullet', sentences_count=5):
-        """Gera um resumo do texto no estilo especificado"""
+        `tokens` (TokenizedDocument do mesmo texto) evita tokenizar o texto de novo.
+        """
         if style == 'bullet':
-            return self._bullet_summary(text, sentences_count)
+            return self._bullet_summary(text, sentences_count, tokens)
         elif style == 'flashcard':
-            return self._flashcard_summary(text)
+            return self._flashcard_summary(text, tokens)
         elif style == 'dissertative':
-            return self._dissertative_summary(text)
+            return self._dissertative_summary(text, tokens)
         elif style == 'mindmap':
-            return self._mindmap_summary(text)
+            return self._mindmap_summary(text, tokens)
         else:
-            return self._bullet_summary(text, sentences_count)
-
-    def _bullet_summary(self, text, sentences_count):
+            return self._bullet_summary(text, sentences_count, tokens)
+
+    def _sentences(self, text, tokens):
+        return tokens.sentences if tokens is not None else nlp.sent_tokenize(text)
+
+    def summarize_sections(self, sections, sentences_count=5, styles=SUMMARY_STYLES):
+        """Resume várias seções (TokenizedDocument) em todos os estilos.
+
+        Os resumos em tópicos de todas as seções saem de uma única chamada
+        ao LSA em lote. Retorna uma lista de {estilo: resumo}, uma por seção.
+        """
+        results = [{} for _ in sections]
+        if 'bullet' in styles:
+            for result, summary in zip(results, nlp.lsa_summarizer.summarize_many(sections, sentences_count)):
+                result['bullet'] = "\n• ".join(summary)
+
+        for result, tokens in zip(results, sections):
+            text = " ".join(tokens.sentences)
+            for style in styles:
+                if style != 'bullet':
+                    result[style] = self.generate_summary(text, style, sentences_count, tokens)
+        return results
+
+    def _bullet_summary(self, text, sentences_count, tokens=None):
         """Resumo em tópicos"""
-        parser = PlaintextParser.from_string(text, Tokenizer('portuguese'))
-        summarizer = LsaSummarizer()
-        summary = summarizer(parser.document, sentences_count)
-        return "\n• ".join([str(sentence) for sentence in summary])
+        if tokens is None:
+            tokens = TokenizedDocument.from_text(text)
+        summary = nlp.lsa_summarizer(tokens, sentences_count)
+        return "\n• ".join(summary)
 
-    def _flashcard_summary(self, text):
+    def _flashcard_summary(self, text, tokens=None):
         """Resumo em formato de flashcards (pergunta e resposta)"""
-        sentences = sent_tokenize(text, language='portuguese')
+        sentences = self._sentences(text, tokens)
         if len(sentences) < 2:
             return "Pergunta: Qual é o tópico principal?\nResposta: " + text[:200] + "..."
 
@@ -178,22 +1183,22 @@ class ContentSummarizer:
         answer = " ".join(sentences[1:3])[:300] + "..."
         return f"Pergunta: {question}\nResposta: {answer}"
 
-    def _dissertative_summary(self, text):
+    def _dissertative_summary(self, text, tokens=None):
         """Resumo dissertativo"""
-        sentences = sent_tokenize(text, language='portuguese')
+        sentences = self._sentences(text, tokens)
         if not sentences:
             return ""
 
-        keywords = self._extract_keywords(text)
+        keywords = self._extract_keywords(text, tokens=tokens)
         intro = f"O texto aborda principalmente sobre {', '.join(keywords[:3])}. "
         development = " ".join(sentences[:3])[:500] + "..."
         conclusion = "Portanto, pode-se compreender que " + sentences[-1][:150] + "..."
 
         return intro + development + conclusion
 
-    def _mindmap_summary(self, text):
+    def _mindmap_summary(self, text, tokens=None):
         """Resumo em formato de mapa mental"""
-        keywords = self._extract_keywords(text)
+        keywords = self._extract_keywords(text, tokens=tokens)
         main_topic = keywords[0] if keywords else "Tópico Principal"
 
         branches = []
@@ -202,11 +1207,29 @@ class ContentSummarizer:
 
         return f"{main_topic}\n" + "\n".join(branches)
 
-    def _extract_keywords(self, text, num_keywords=5):
-        """Extrai palavras-chave do texto"""
-        words = word_tokenize(text.lower(), language='portuguese')
-        words = [word for word in words if word.isalnum() and word not in self.stop_words]
-        freq = nltk.FreqDist(words)
+    def _extract_keywords(self, text, num_keywords=5, tokens=None):
+        """Extrai palavras-chave do texto.
+
+        Com o índice de termos (DatabaseManager ou TermWeights) e o texto já
+        tokenizado, é uma consulta TF-IDF às frequências gravadas na
+        ingestão; caso contrário, conta as palavras do próprio texto.
+        """
+        if tokens is not None and self.term_index is not None:
+            keywords = self.term_index.keywords(tokens, num_keywords)
+            if keywords:
+                return keywords
+
+        if self.cache:
+            return self.cache.get_or_compute(
+                'keywords', text,
+                lambda: self._compute_keywords(text, num_keywords, tokens),
+                num_keywords=num_keywords
+            )
+        return self._compute_keywords(text, num_keywords, tokens)
+
+    def _compute_keywords(self, text, num_keywords, tokens=None):
+        words = tokens.tokens if tokens is not None else nlp.word_tokenize(text.lower())
+        freq = Counter(word for word in words if word.isalnum() and word not in self.stop_words)
         return [word for word, _ in freq.most_common(num_keywords)]
 
     def _create_question(self, sentence):
@@ -215,8 +1238,161 @@ class ContentSummarizer:
         return sentence[:100] + "?"
 
 
+def _summarize_chapter(chapter_index, chapter, blocks, tokens, sentences_count=5, weights=None):
+    """Resume um capítulo inteiro, seus temas e subtemas, em todos os estilos.
+
+    `blocks` traz (content_id, tema, subtema) de cada bloco do capítulo e
+    `tokens` o TokenizedDocument desses blocos; `weights` (TermWeights)
+    pondera as palavras-chave. Executa em um processo do pool e retorna as
+    linhas prontas para DatabaseManager.save_summaries.
+    """
+    sections = {(1, chapter, '', ''): []}
+    for content_id, theme, subtheme in blocks:
+        sections[(1, chapter, '', '')].append(content_id)
+        sections.setdefault((2, chapter, theme, ''), []).append(content_id)
+        sections.setdefault((3, chapter, theme, subtheme), []).append(content_id)
+
+    keys = list(sections)
+    summaries = ContentSummarizer(term_index=weights).summarize_sections(
+        [tokens.select(sections[key]) for key in keys], sentences_count
+    )
+    return [
+        (chapter_index, section_index, *key, style, summary)
+        for section_index, (key, styles) in enumerate(zip(keys, summaries))
+        for style, summary in styles.items()
+    ]
+
+
+class DocumentSummaryPipeline:
+    """Resume um documento inteiro, capítulo por capítulo, em um pool de processos.
+
+    Cada capítulo é uma tarefa independente; os resultados são gravados na
+    tabela summaries à medida que ficam prontos, e run() gera o progresso
+    (capítulos concluídos, total) para a interface.
+    """
+
+    def __init__(self, workers=None, sentences_count=5):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.sentences_count = sentences_count
+
+    def run(self, db, document_id):
+        tokens = db.get_tokenized_document(document_id)
+        chapters = defaultdict(list)
+        for content_id, chapter, theme, subtheme in db.get_content_sections(document_id):
+            chapters[chapter].append((content_id, theme, subtheme))
+
+        db.delete_summaries(document_id)
+        weights = db.get_term_weights(document_id)
+        total = len(chapters)
+        tasks = [
+            (i, chapter, blocks, tokens.select([block[0] for block in blocks]), self.sentences_count, weights)
+            for i, (chapter, blocks) in enumerate(chapters.items())
+        ]
+
+        if self.workers == 1 or total < 2:
+            for done, task in enumerate(tasks, 1):
+                db.save_summaries(document_id, _summarize_chapter(*task))
+                yield done, total
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, total)) as pool:
+            futures = [pool.submit(_summarize_chapter, *task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                db.save_summaries(document_id, future.result())
+                yield done, total
+
+
+class DistractorPool:
+    """Frases do documento ordenadas por tamanho, para sortear alternativas.
+
+    Montado uma vez por documento; draw() busca, por busca binária, frases de
+    tamanho parecido com o da resposta correta, de modo que as alternativas
+    erradas não se denunciem pelo comprimento.
+    """
+
+    def __init__(self, sentences, window=6):
+        self.sentences = sentences
+        self.window = window
+        lengths = np.array([len(sentence) for sentence in sentences], dtype=np.int64)
+        self.order = np.argsort(lengths, kind='stable')
+        self.lengths = lengths[self.order]
+
+    def draw(self, length, count, exclude=(), rng=random):
+        """Sorteia `count` frases distintas com tamanho próximo de `length`, fora das frases `exclude`"""
+        center = int(np.searchsorted(self.lengths, length))
+        window = self.window + count + len(exclude)
+        excluded = set(exclude)
+
+        candidates = []
+        for i in self.order[max(0, center - window):center + window].tolist():
+            sentence = self.sentences[i]
+            if sentence not in excluded and sentence not in candidates:
+                candidates.append(sentence)
+        return rng.sample(candidates, min(count, len(candidates)))
+
+
+class QuestionDeduplicator:
+    """Descarta questões iguais ou quase iguais às já aceitas.
+
+    Cópias exatas (após normalização) são detectadas por hash; para as
+    quase iguais usa MinHash sobre trigramas de palavras com LSH em faixas,
+    comparando apenas as questões que caem no mesmo balde.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold=0.8, num_perm=32, bands=8, seed=1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.exact = set()
+        self.buckets = defaultdict(list)
+
+    @staticmethod
+    def question_text(question):
+        """Enunciado e resposta, no mesmo formato gravado na tabela questions"""
+        text = question.get('question') or question.get('statement', '')
+        if question.get('context'):
+            text = f"{question['context']}\n\n{text}"
+        return f"{text} {question['answer']}"
+
+    def signature(self, text):
+        words = re.findall(r'\w+', text.lower())
+        shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+        hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % np.uint64(self.PRIME)).min(axis=0)
+
+    def add(self, question):
+        """Registra a questão; retorna False se ela duplica uma anterior"""
+        return self.add_text(self.question_text(question))
+
+    def add_text(self, text):
+        digest = hashlib.blake2b(" ".join(text.lower().split()).encode('utf-8'), digest_size=16).digest()
+        if digest in self.exact:
+            return False
+
+        signature = self.signature(text)
+        bands = [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+        for key in bands:
+            for other in self.buckets.get(key, ()):
+                if np.mean(other == signature) >= self.threshold:
+                    return False
+
+        self.exact.add(digest)
+        for key in bands:
+            self.buckets[key].append(signature)
+        return True
+
+
 class QuizGenerator:
-    def __init__(self):
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
         self.question_types = {
             'multiple_choice': self._generate_multiple_choice,
             'true_false': self._generate_true_false,
@@ -225,32 +1401,60 @@ class QuizGenerator:
         }
 
     def generate_quiz(self, content, num_questions=5, q_type='multiple_choice'):
-        """Gera um quiz com base no conteúdo"""
-        generator = self.question_types.get(q_type, self._generate_multiple_choice)
+        """Gera um quiz com base no conteúdo.
+
+        `content` pode ser texto, o dicionário estruturado ou um
+        TokenizedDocument; as frases são extraídas uma única vez por quiz.
+        """
+        return self.generate_bulk(content, num_questions, [q_type])
+
+    def generate_bulk(self, content, num_questions, q_types=('multiple_choice',), deduplicator=None, pool=None):
+        """Gera até `num_questions` questões distintas em uma única passagem.
+
+        As frases de origem são sorteadas sem reposição, os tipos pedidos se
+        alternam e as alternativas vêm de `pool` (ex.: um DistractorPool do
+        documento inteiro, montado uma vez) ou de um pool do próprio conteúdo.
+        Questões quase iguais às anteriores são descartadas; passar o mesmo
+        `deduplicator` em várias chamadas estende a verificação a todas. Com
+        um TokenizedDocument, cada questão traz o content_id do seu bloco.
+        """
+        sentences = self._extract_sentences(content)
+        content_ids = content.content_ids if isinstance(content, TokenizedDocument) else None
+        generators = [self.question_types.get(q_type, self._generate_multiple_choice) for q_type in q_types]
+        pool = pool or DistractorPool(sentences)
+        deduplicator = deduplicator or QuestionDeduplicator()
         questions = []
 
-        for _ in range(num_questions):
-            question = generator(content)
-            if question:
+        for index in self.rng.sample(range(len(sentences)), len(sentences)):
+            if len(questions) >= num_questions:
+                break
+
+            question = generators[len(questions) % len(generators)](sentences, index, pool)
+            if question and deduplicator.add(question):
+                if content_ids is not None:
+                    question['content_id'] = int(content_ids[index])
                 questions.append(question)
 
         return questions
 
-    def _generate_multiple_choice(self, content):
+    def _generate_multiple_choice(self, sentences, index, pool):
         """Gera questão de múltipla escolha"""
-        sentences = self._extract_sentences(content)
-        if len(sentences) < 4:
+        if len(pool.sentences) < 4 or index + 1 >= len(sentences):
             return None
 
-        question = self._create_question(sentences[0])
-        correct = sentences[1][:100]
-        options = [
-            correct,
-            sentences[2][:100],
-            sentences[3][:100],
-            self._modify_sentence(correct)
+        question = self._create_question(sentences[index])
+        correct = sentences[index + 1][:100]
+        distractors = [
+            sentence[:100]
+            for sentence in pool.draw(
+                len(sentences[index + 1]), 3, exclude={sentences[index], sentences[index + 1]}, rng=self.rng
+            )
         ]
-        random.shuffle(options)
+        # A frase modificada parece correta demais; só entra se o documento não tem frases suficientes
+        if len(distractors) < 3:
+            distractors.append(self._modify_sentence(correct))
+        options = list(dict.fromkeys([correct] + distractors))
+        self.rng.shuffle(options)
 
         return {
             'type': 'multiple_choice',
@@ -260,14 +1464,13 @@ class QuizGenerator:
             'explanation': "Esta informação pode ser encontrada no texto original."
         }
 
-    def _generate_true_false(self, content):
+    def _generate_true_false(self, sentences, index, pool):
         """Gera questão de verdadeiro ou falso"""
-        sentences = self._extract_sentences(content)
         if not sentences:
             return None
 
-        sentence = random.choice(sentences)
-        is_true = random.choice([True, False])
+        sentence = sentences[index]
+        is_true = self.rng.choice([True, False])
         modified_sentence = self._modify_sentence(sentence) if not is_true else sentence
 
         return {
@@ -277,14 +1480,13 @@ class QuizGenerator:
             'explanation': "Esta afirmação está de acordo com o texto original." if is_true else "Esta afirmação contradiz o texto original."
         }
 
-    def _generate_short_answer(self, content):
+    def _generate_short_answer(self, sentences, index, pool):
         """Gera questão de resposta curta"""
-        sentences = self._extract_sentences(content)
-        if not sentences:
+        if index + 1 >= len(sentences):
             return None
 
-        question = self._create_question(sentences[0])
-        answer = sentences[1][:150]
+        question = self._create_question(sentences[index])
+        answer = sentences[index + 1][:150]
 
         return {
             'type': 'short_answer',
@@ -293,15 +1495,14 @@ class QuizGenerator:
             'explanation': "A resposta pode ser encontrada no texto original."
         }
 
-    def _generate_case_study(self, content):
+    def _generate_case_study(self, sentences, index, pool):
         """Gera estudo de caso"""
-        sentences = self._extract_sentences(content)
-        if len(sentences) < 3:
+        if index + 3 >= len(sentences):
             return None
 
-        context = " ".join(sentences[:3])
+        context = " ".join(sentences[index:index + 3])
         question = "Como você resolveria esta situação?"
-        answer = "Uma possível solução seria " + sentences[-1][:150]
+        answer = "Uma possível solução seria " + sentences[index + 3][:150]
 
         return {
             'type': 'case_study',
@@ -313,15 +1514,17 @@ class QuizGenerator:
 
     def _extract_sentences(self, content):
         """Extrai frases do conteúdo"""
-        if isinstance(content, str):
-            return sent_tokenize(content, language='portuguese')
+        if isinstance(content, TokenizedDocument):
+            return content.sentences
+        elif isinstance(content, str):
+            return nlp.sent_tokenize(content)
         elif isinstance(content, dict):
             all_sentences = []
             for chapter in content.get('chapters', {}).values():
                 for theme in chapter.get('themes', {}).values():
                     for subtheme in theme.get('subthemes', {}).values():
                         for block in subtheme:
-                            all_sentences.extend(sent_tokenize(block['text'], language='portuguese'))
+                            all_sentences.extend(nlp.sent_tokenize(block['text']))
             return all_sentences
         return []
 
@@ -332,7 +1535,7 @@ class QuizGenerator:
 
     def _modify_sentence(self, sentence):
         """Modifica uma frase para criar alternativas incorretas"""
-        words = word_tokenize(sentence, language='portuguese')
+        words = nlp.word_tokenize(sentence)
         if len(words) < 3:
             return sentence + " (incorreta)"
 
@@ -353,17 +1556,191 @@ class QuizGenerator:
         return " ".join(words) + "..."
 
 
-class DatabaseManager:
-    def __init__(self, db_path='estudazilla.db'):
-        self.conn = sqlite3.connect(db_path)
-        self._create_tables()
+class FlashcardGenerator:
+    """Gera flashcards (pergunta, resposta) a partir de pares de frases.
 
-    def _create_tables(self):
-        """Cria as tabelas do banco de dados"""
-        cursor = self.conn.cursor()
+    Frases definitórias ("X é Y", "X são Y", "X significa Y") viram "O que é
+    X?" com a frase como resposta; sem definições, uma frase serve de pista
+    e as duas seguintes de resposta, como em ContentSummarizer._flashcard_summary.
+    Cada cartão fica ligado ao bloco (content_id) de onde saiu.
+    """
+
+    DEFINITION = re.compile(
+        r'^(?P<term>[^,.;:!?]{3,60}?)\s+(?P<verb>é|são|significa|significam|consiste em|refere-se a)\s+(?P<body>.{10,})$',
+        re.IGNORECASE | re.DOTALL
+    )
+
+    def __init__(self, cards_per_block=3, max_answer=300):
+        self.cards_per_block = cards_per_block
+        self.max_answer = max_answer
+        self.summarizer = ContentSummarizer()
+
+    def for_block(self, tokens):
+        """Flashcards de um bloco (TokenizedDocument de um único content_id)"""
+        sentences = tokens.sentences
+        cards = []
+        used = set()
+
+        for i, sentence in enumerate(sentences):
+            match = self.DEFINITION.match(sentence.strip())
+            if match and len(cards) < self.cards_per_block:
+                verb = 'são' if match.group('verb').lower() in ('são', 'significam') else 'é'
+                term = match.group('term').strip()
+                first_word = term.split()[0]
+                if not (len(first_word) > 1 and first_word.isupper()):
+                    term = term[0].lower() + term[1:]
+                cards.append((f"O que {verb} {term}?", sentence.strip()[:self.max_answer]))
+                used.add(i)
+
+        # Completa com pares pista/resposta das frases restantes
+        i = 0
+        while len(cards) < self.cards_per_block and i + 1 < len(sentences):
+            if i in used or i + 1 in used:
+                i += 1
+                continue
+            # Sem a pontuação final da frase (evita "texto.?")
+            question = self.summarizer._create_question(sentences[i].rstrip(' .!?;:'))
+            answer = " ".join(sentences[i + 1:i + 3])[:self.max_answer]
+            cards.append((question, answer))
+            used.update(range(i, i + 3))
+            i += 3
+
+        return cards
+
+    def for_document(self, tokens, skip=()):
+        """Flashcards de todos os blocos: [(content_id, pergunta, resposta)]
+
+        Blocos em `skip` (que já têm flashcards) são ignorados.
+        """
+        rows = []
+        for content_id in dict.fromkeys(tokens.content_ids.tolist()):
+            if content_id in skip:
+                continue
+            rows.extend(
+                (content_id, question, answer)
+                for question, answer in self.for_block(tokens.for_content(content_id))
+            )
+        return rows
+
+
+class SM2Scheduler:
+    """Agendamento de revisões de flashcards pelo algoritmo SM-2.
+
+    Cada cartão guarda facilidade (ease), intervalo em dias, número de
+    acertos seguidos e a data da próxima revisão. A nota vai de 0 (esqueci)
+    a 5 (fácil); abaixo de 3 o cartão volta ao início.
+    """
+
+    MIN_EASE = 1.3
+
+    def review(self, ease, interval, repetitions, grade, now=None):
+        """Retorna (ease, intervalo, repetições, próxima revisão) após uma resposta"""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+
+        if grade < 3:
+            repetitions = 0
+            interval = 1
+        else:
+            if repetitions == 0:
+                interval = 1
+            elif repetitions == 1:
+                interval = 6
+            else:
+                interval = round(interval * ease)
+            repetitions += 1
+
+        ease = max(self.MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        due = now + datetime.timedelta(days=interval)
+        return ease, interval, repetitions, sql_datetime(due)
+
+
+def sql_datetime(moment=None):
+    """Data/hora em UTC no formato do datetime('now') do SQLite"""
+    moment = moment or datetime.datetime.now(datetime.timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+CONTENT_BATCH_SIZE = 50
+
+# Filtros e estratos do banco de questões: nome -> coluna (questions q JOIN content c)
+QUESTION_COLUMNS = {
+    'document_id': 'c.document_id',
+    'chapter': 'c.chapter',
+    'theme': 'c.theme',
+    'question_type': 'q.question_type',
+    'difficulty': 'q.difficulty',
+}
+
+QUESTION_SELECT_SQL = '''
+SELECT q.id, q.question_text, q.options, q.correct_answer, q.explanation, c.chapter, c.theme,
+       q.question_type, q.difficulty
+FROM questions q
+JOIN content c ON q.content_id = c.id
+'''
+
+
+def stratified_quotas(sizes, total, proportional=True):
+    """Divide `total` questões entre estratos de tamanhos `sizes`.
+
+    Proporcional ao tamanho (ou igual para todos) pelo método dos maiores
+    restos, sem passar do tamanho de cada estrato; a sobra dos estratos
+    pequenos vai para os que ainda têm questões disponíveis.
+    """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    quotas = np.zeros(len(sizes), dtype=np.int64)
+    remaining = min(int(total), int(sizes.sum()))
+
+    while remaining > 0:
+        room = sizes - quotas
+        open_strata = room > 0
+        weights = np.where(open_strata, sizes if proportional else 1, 0).astype(float)
+        share = remaining * weights / weights.sum()
+        extra = np.minimum(np.floor(share).astype(np.int64), room)
+
+        # Maiores restos recebem uma questão a mais
+        leftover = remaining - int(extra.sum())
+        if leftover > 0:
+            candidates = np.flatnonzero(open_strata & (extra < room))
+            order = candidates[np.argsort(-(share - np.floor(share))[candidates], kind='stable')]
+            extra[order[:leftover]] += 1
+
+        quotas += extra
+        remaining -= int(extra.sum())
+
+    return quotas.tolist()
+
+
+# Configuração padrão de escrita: WAL permite leituras durante as gravações e
+# synchronous=NORMAL evita um fsync a cada commit (seguro com WAL)
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+# SQL compartilhado: textos idênticos reaproveitam o statement preparado no cache da conexão
+INSERT_CONTENT_SQL = '''
+INSERT INTO content (document_id, chapter, theme, subtheme, page, text_content)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+INSERT_FLASHCARD_SQL = '''
+INSERT INTO flashcards (content_id, question, answer, created_date, due_date)
+VALUES (?, ?, ?, datetime('now'), datetime('now'))
+'''
+INSERT_QUESTION_SQL = '''
+INSERT INTO questions (
+    content_id, question_type, question_text, options,
+    correct_answer, explanation, difficulty, created_date
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+'''
 
+
+# Migrações do esquema: cada versão é aplicada uma única vez, em ordem, e
+# registrada em PRAGMA user_version e na tabela schema_migrations
+SCHEMA_MIGRATIONS = [
+    (1, "Tabelas iniciais", [
         # Tabela de documentos
-        cursor.execute('''
+        '''
         CREATE TABLE IF NOT EXISTS documents (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -373,10 +1750,9 @@ class DatabaseManager:
             category TEXT,
             pages INTEGER
         )
-        ''')
-
+        ''',
         # Tabela de conteúdo
-        cursor.execute('''
+        '''
         CREATE TABLE IF NOT EXISTS content (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             document_id INTEGER,
@@ -389,10 +1765,9 @@ class DatabaseManager:
             last_reviewed TEXT,
             FOREIGN KEY (document_id) REFERENCES documents (id)
         )
-        ''')
-
+        ''',
         # Tabela de flashcards
-        cursor.execute('''
+        '''
         CREATE TABLE IF NOT EXISTS flashcards (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             content_id INTEGER,
@@ -403,10 +1778,9 @@ class DatabaseManager:
             difficulty INTEGER DEFAULT 1,
             FOREIGN KEY (content_id) REFERENCES content (id)
         )
-        ''')
-
+        ''',
         # Tabela de questões
-        cursor.execute('''
+        '''
         CREATE TABLE IF NOT EXISTS questions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             content_id INTEGER,
@@ -419,9 +1793,390 @@ class DatabaseManager:
             created_date TEXT NOT NULL,
             FOREIGN KEY (content_id) REFERENCES content (id)
         )
+        ''',
+        # Índice de seções (sumário) de cada documento
+        '''
+        CREATE TABLE IF NOT EXISTS outline (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            char_offset INTEGER NOT NULL,
+            chapter TEXT,
+            theme TEXT,
+            subtheme TEXT,
+            FOREIGN KEY (document_id) REFERENCES documents (id)
+        )
+        ''',
+        # Cache de ingestão: hash do arquivo -> documento já processado
+        '''
+        CREATE TABLE IF NOT EXISTS document_hashes (
+            sha256 TEXT PRIMARY KEY,
+            document_id INTEGER NOT NULL,
+            FOREIGN KEY (document_id) REFERENCES documents (id)
+        )
+        ''',
+        # Cache de ingestão por página: impressão digital -> texto extraído
+        '''
+        CREATE TABLE IF NOT EXISTS page_cache (
+            page_hash TEXT PRIMARY KEY,
+            text_content TEXT NOT NULL,
+            source TEXT NOT NULL,
+            created_date TEXT NOT NULL
+        )
+        ''',
+    ]),
+    (2, "Índices das consultas de conteúdo, questões e flashcards", [
+        'CREATE INDEX IF NOT EXISTS idx_content_document_page ON content (document_id, page)',
+        'CREATE INDEX IF NOT EXISTS idx_content_section ON content (document_id, chapter, theme, subtheme, page)',
+        'CREATE INDEX IF NOT EXISTS idx_questions_type_content ON questions (question_type, content_id)',
+        'CREATE INDEX IF NOT EXISTS idx_questions_content ON questions (content_id)',
+        'CREATE INDEX IF NOT EXISTS idx_flashcards_last_reviewed ON flashcards (last_reviewed)',
+        'CREATE INDEX IF NOT EXISTS idx_flashcards_content ON flashcards (content_id)',
+        'CREATE INDEX IF NOT EXISTS idx_documents_last_accessed ON documents (last_accessed)',
+        'CREATE INDEX IF NOT EXISTS idx_document_hashes_document ON document_hashes (document_id)',
+        'CREATE INDEX IF NOT EXISTS idx_outline_document ON outline (document_id)',
+        'ANALYZE',
+    ]),
+    (3, "Busca textual (FTS5) sincronizada com a tabela content", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+            text_content, chapter, theme, subtheme,
+            content='content', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS content_fts_insert AFTER INSERT ON content BEGIN
+            INSERT INTO content_fts (rowid, text_content, chapter, theme, subtheme)
+            VALUES (new.id, new.text_content, new.chapter, new.theme, new.subtheme);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS content_fts_delete AFTER DELETE ON content BEGIN
+            INSERT INTO content_fts (content_fts, rowid, text_content, chapter, theme, subtheme)
+            VALUES ('delete', old.id, old.text_content, old.chapter, old.theme, old.subtheme);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS content_fts_update AFTER UPDATE ON content BEGIN
+            INSERT INTO content_fts (content_fts, rowid, text_content, chapter, theme, subtheme)
+            VALUES ('delete', old.id, old.text_content, old.chapter, old.theme, old.subtheme);
+            INSERT INTO content_fts (rowid, text_content, chapter, theme, subtheme)
+            VALUES (new.id, new.text_content, new.chapter, new.theme, new.subtheme);
+        END
+        ''',
+        # Indexa o conteúdo já existente
+        "INSERT INTO content_fts (content_fts) VALUES ('rebuild')",
+    ]),
+    (4, "Cache persistente de resumos e questões geradas", [
+        '''
+        CREATE TABLE IF NOT EXISTS computation_cache (
+            cache_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_date TEXT NOT NULL,
+            last_used TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_computation_cache_last_used ON computation_cache (last_used)',
+    ]),
+    (5, "Frases e palavras tokenizadas de cada bloco", [
+        '''
+        CREATE TABLE IF NOT EXISTS content_tokens (
+            content_id INTEGER PRIMARY KEY,
+            document_id INTEGER NOT NULL,
+            data TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_content_tokens_document ON content_tokens (document_id)',
+    ]),
+    (6, "Resumos de capítulos, temas e subtemas", [
+        '''
+        CREATE TABLE IF NOT EXISTS summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id INTEGER NOT NULL,
+            chapter_index INTEGER NOT NULL,
+            section_index INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            chapter TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            subtheme TEXT NOT NULL,
+            style TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            created_date TEXT NOT NULL,
+            UNIQUE (document_id, style, chapter, theme, subtheme)
+        )
+        ''',
+    ]),
+    (7, "Índice de termos por bloco, documento e acervo", [
+        '''
+        CREATE TABLE IF NOT EXISTS block_terms (
+            content_id INTEGER NOT NULL,
+            document_id INTEGER NOT NULL,
+            term TEXT NOT NULL,
+            tf INTEGER NOT NULL,
+            PRIMARY KEY (content_id, term)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_block_terms_document ON block_terms (document_id, term)',
+        '''
+        CREATE TABLE IF NOT EXISTS document_terms (
+            document_id INTEGER NOT NULL,
+            term TEXT NOT NULL,
+            tf INTEGER NOT NULL,
+            df INTEGER NOT NULL,
+            PRIMARY KEY (document_id, term)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS corpus_terms (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    (8, "Progresso da geração do banco de questões", [
+        '''
+        CREATE TABLE IF NOT EXISTS question_jobs (
+            document_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            last_content_id INTEGER NOT NULL DEFAULT 0,
+            blocks_done INTEGER NOT NULL DEFAULT 0,
+            blocks_total INTEGER NOT NULL,
+            questions INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_date TEXT NOT NULL
+        )
+        ''',
+    ]),
+    (9, "Índice do banco de questões por tipo e dificuldade", [
+        'CREATE INDEX IF NOT EXISTS idx_questions_type_difficulty ON questions (question_type, difficulty, content_id)',
+        'ANALYZE',
+    ]),
+    (10, "Revisão espaçada (SM-2) dos flashcards", [
+        'ALTER TABLE flashcards ADD COLUMN ease REAL NOT NULL DEFAULT 2.5',
+        'ALTER TABLE flashcards ADD COLUMN interval_days INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE flashcards ADD COLUMN repetitions INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE flashcards ADD COLUMN due_date TEXT',
+        "UPDATE flashcards SET due_date = COALESCE(last_reviewed, created_date, datetime('now'))",
+        'CREATE INDEX IF NOT EXISTS idx_flashcards_due ON flashcards (due_date)',
+    ]),
+    (11, "Descarta páginas em branco do cache (o teste de página em branco mudou)", [
+        "DELETE FROM page_cache WHERE source = 'blank'",
+    ]),
+    (12, "Linhas em fonte grande no cache de páginas", [
+        'ALTER TABLE page_cache ADD COLUMN large_lines TEXT',
+        # Sem as linhas em fonte grande as páginas de texto antigas dariam
+        # outros títulos; as de OCR não têm fonte e continuam válidas
+        "DELETE FROM page_cache WHERE source = 'text'",
+    ]),
+]
+
+
+def fts_query(text):
+    """Converte o texto digitado em uma consulta FTS5 segura.
+
+    Cada termo vira uma frase entre aspas (sem operadores do usuário) e o
+    último termo aceita prefixo, para a busca funcionar enquanto se digita.
+    """
+    terms = re.findall(r'\w+', text, re.UNICODE)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+class _Lease:
+    """Marca a posse de uma conexão pela thread atual (liberada quando a thread termina)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite do processo, com uma conexão por thread.
+
+    Cada thread recebe sua própria conexão no primeiro acesso e a devolve ao
+    pool quando termina (ex.: ao fim de um rerun do Streamlit), para ser
+    reaproveitada pela próxima. Como uma conexão nunca é usada por duas
+    threads ao mesmo tempo, check_same_thread pode ser desativado.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, db_path, **kwargs):
+        """Retorna o pool compartilhado do arquivo (bancos em memória não são compartilhados)"""
+        if db_path == ':memory:':
+            return cls(db_path, **kwargs)
+
+        key = os.path.abspath(db_path)
+        with cls._pools_lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(db_path, **kwargs)
+            return cls._pools[key]
+
+    def __init__(self, db_path, pragmas=None, cached_statements=256, timeout=30, max_idle=8):
+        self.db_path = db_path
+        self.pragmas = pragmas or DB_PRAGMAS
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+        # Banco em memória: cada conexão seria um banco diferente, então há uma só
+        self._memory_conn = self._connect() if db_path == ':memory:' else None
+
+    def connection(self):
+        """Conexão da thread atual"""
+        if self._memory_conn:
+            return self._memory_conn
+
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            conn = self._acquire()
+            lease = _Lease(conn)
+            weakref.finalize(lease, self._release, conn)
+            self._local.lease = lease
+        return lease.conn
+
+    def ensure_schema(self, migrate):
+        """Executa a configuração do esquema apenas uma vez por processo"""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                migrate()
+                self._schema_ready = True
+
+    def close(self):
+        """Fecha as conexões ociosas e a conexão da thread atual"""
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            del self._local.lease
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        # Transação esquecida aberta por uma thread não passa para a próxima
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+class DatabaseManager:
+    def __init__(self, db_path='estudazilla.db', pragmas=None, cached_statements=256):
+        self.db_path = db_path
+        self.pool = ConnectionPool.for_path(db_path, pragmas=pragmas, cached_statements=cached_statements)
+        self.pool.ensure_schema(self._migrate)
+
+    @property
+    def conn(self):
+        """Conexão SQLite exclusiva da thread atual"""
+        return self.pool.connection()
+
+    def _migrate(self):
+        """Aplica as migrações pendentes do esquema"""
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_date TEXT NOT NULL
+        )
         ''')
+        current = self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+
+            # DDL e registro da versão na mesma transação: uma falha não deixa o esquema pela metade.
+            # BEGIN IMMEDIATE trava a escrita já no início; a versão é relida dentro da transação
+            # porque outro processo pode ter aplicado a migração enquanto esperávamos a trava
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                current = self.conn.execute('PRAGMA user_version').fetchone()[0]
+                if version <= current:
+                    self.conn.rollback()
+                    continue
+                for statement in statements:
+                    self.conn.execute(statement)
+                self.conn.execute('''
+                INSERT OR REPLACE INTO schema_migrations (version, description, applied_date)
+                VALUES (?, ?, datetime('now'))
+                ''', (version, description))
+                self.conn.execute(f'PRAGMA user_version = {version}')
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def migrate(self):
+        """Reaplica as migrações (ex.: após restaurar um backup antigo)"""
+        self._migrate()
+
+    def backup_to(self, filename):
+        """Copia o banco para um arquivo usando a API de backup do SQLite"""
+        target = sqlite3.connect(filename)
+        try:
+            self.conn.backup(target)
+        finally:
+            target.close()
 
-        self.conn.commit()
+    def restore_from(self, filename):
+        """Substitui o conteúdo do banco pelo de um arquivo de backup"""
+        source = sqlite3.connect(filename)
+        try:
+            source.backup(self.conn)
+        finally:
+            source.close()
+        self.migrate()
+
+    def reset(self):
+        """Apaga todos os dados, recriando o esquema vazio"""
+        empty = sqlite3.connect(':memory:')
+        try:
+            empty.backup(self.conn)
+        finally:
+            empty.close()
+        self.migrate()
+
+    def schema_version(self):
+        """Versão atual do esquema do banco"""
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
 
     def save_document(self, title, file_path, category=None):
         """Salva um documento no banco de dados"""
@@ -434,18 +2189,416 @@ class DatabaseManager:
         return cursor.lastrowid
 
     def save_content(self, document_id, structured_content):
-        """Salva o conteúdo estruturado no banco de dados"""
+        """Salva o conteúdo estruturado no banco de dados (uma única transação)"""
+        rows = (
+            (document_id, chapter, theme, subtheme, block['page'], block['text'])
+            for chapter, chapter_data in structured_content.get('chapters', {}).items()
+            for theme, theme_data in chapter_data.get('themes', {}).items()
+            for subtheme, blocks in theme_data.get('subthemes', {}).items()
+            for block in blocks
+        )
+
+        with self.conn:
+            self.conn.executemany(INSERT_CONTENT_SQL, rows)
+
+    def save_content_stream(self, document_id, blocks, batch_size=CONTENT_BATCH_SIZE):
+        """Salva blocos à medida que são extraídos, em lotes de `batch_size`.
+
+        Cada lote é gravado e confirmado assim que fica completo, de modo que
+        o conteúdo inicial do documento fica disponível antes do fim da extração.
+        """
+        batch = []
+        saved = 0
+
+        for block in blocks:
+            batch.append((document_id, *section_labels(block), block['page'], block['text']))
+            if len(batch) >= batch_size:
+                with self.conn:
+                    self.conn.executemany(INSERT_CONTENT_SQL, batch)
+                saved += len(batch)
+                batch = []
+
+        if batch:
+            with self.conn:
+                self.conn.executemany(INSERT_CONTENT_SQL, batch)
+            saved += len(batch)
+
+        return saved
+
+    def update_document_pages(self, document_id, pages):
+        """Atualiza o número de páginas de um documento"""
         cursor = self.conn.cursor()
+        cursor.execute('UPDATE documents SET pages = ? WHERE id = ?', (pages, document_id))
+        self.conn.commit()
 
-        for chapter, chapter_data in structured_content.get('chapters', {}).items():
-            for theme, theme_data in chapter_data.get('themes', {}).items():
-                for subtheme, blocks in theme_data.get('subthemes', {}).items():
-                    for block in blocks:
-                        cursor.execute('''
-                        INSERT INTO content (document_id, chapter, theme, subtheme, page, text_content)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (document_id, chapter, theme, subtheme, block['page'], block['text']))
+    def delete_document(self, document_id):
+        """Remove um documento e o conteúdo associado"""
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM document_hashes WHERE document_id = ?', (document_id,))
+        cursor.execute('DELETE FROM outline WHERE document_id = ?', (document_id,))
+        cursor.execute('DELETE FROM content_tokens WHERE document_id = ?', (document_id,))
+        cursor.execute('DELETE FROM summaries WHERE document_id = ?', (document_id,))
+        cursor.execute('DELETE FROM question_jobs WHERE document_id = ?', (document_id,))
+        self._unindex_terms(document_id)
+        cursor.execute('DELETE FROM content WHERE document_id = ?', (document_id,))
+        cursor.execute('DELETE FROM documents WHERE id = ?', (document_id,))
+        self.conn.commit()
 
+    def save_outline(self, document_id, outline):
+        """Salva o índice de seções gerado na extração"""
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+        INSERT INTO outline (document_id, level, title, page, char_offset, chapter, theme, subtheme)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (document_id, entry['level'], entry['title'], entry['page'], entry['offset'], *entry['labels'])
+            for entry in outline
+        ])
+        self.conn.commit()
+
+    def get_outline(self, document_id):
+        """Obtém o índice de seções de um documento, na ordem de leitura"""
+        cursor = self.conn.cursor()
+        query = '''
+        SELECT level, title, page, char_offset, chapter, theme, subtheme
+        FROM outline
+        WHERE document_id = ?
+        ORDER BY id
+        '''
+        cursor.execute(query, (document_id,))
+        rows = cursor.fetchall()
+
+        if not rows:
+            # Documentos importados antes do índice: gera a partir do conteúdo
+            cursor.execute('''
+            INSERT INTO outline (document_id, level, title, page, char_offset, chapter, theme, subtheme)
+            SELECT document_id, 0, chapter, MIN(page), 0, chapter, theme, subtheme
+            FROM content
+            WHERE document_id = ?
+            GROUP BY chapter, theme, subtheme
+            ORDER BY MIN(id)
+            ''', (document_id,))
+            self.conn.commit()
+            cursor.execute(query, (document_id,))
+            rows = cursor.fetchall()
+
+        return rows
+
+    def get_section_content(self, document_id, chapter, theme, subtheme):
+        """Obtém os blocos de uma seção (capítulo, tema e subtema) de um documento"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, page, text_content
+        FROM content
+        WHERE document_id = ? AND chapter = ? AND theme = ? AND subtheme = ?
+        ORDER BY page, id
+        ''', (document_id, chapter, theme, subtheme))
+        return [{'id': row[0], 'page': row[1], 'text': row[2]} for row in cursor.fetchall()]
+
+    def get_content_sections(self, document_id):
+        """Obtém (id, capítulo, tema, subtema) de cada bloco, na ordem de leitura"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, chapter, theme, subtheme
+        FROM content
+        WHERE document_id = ?
+        ORDER BY id
+        ''', (document_id,))
+        return cursor.fetchall()
+
+    def save_summaries(self, document_id, summaries):
+        """Salva as linhas geradas por _summarize_chapter em uma transação"""
+        with self.conn:
+            self.conn.executemany('''
+            INSERT OR REPLACE INTO summaries
+                (document_id, chapter_index, section_index, level, chapter, theme, subtheme, style, summary, created_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            ''', [(document_id, *row) for row in summaries])
+
+    def delete_summaries(self, document_id):
+        with self.conn:
+            self.conn.execute('DELETE FROM summaries WHERE document_id = ?', (document_id,))
+
+    def get_summaries(self, document_id, style='bullet'):
+        """Obtém os resumos de um documento em um estilo, na ordem dos capítulos"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT level, chapter, theme, subtheme, summary
+        FROM summaries
+        WHERE document_id = ? AND style = ?
+        ORDER BY chapter_index, section_index
+        ''', (document_id, style))
+        return [
+            {'level': row[0], 'chapter': row[1], 'theme': row[2], 'subtheme': row[3], 'summary': row[4]}
+            for row in cursor.fetchall()
+        ]
+
+    def index_document_terms(self, document_id, tokens=None):
+        """Grava as frequências dos termos do documento no índice de termos.
+
+        tf por bloco (block_terms), tf e df entre os blocos do documento
+        (document_terms) e df entre documentos (corpus_terms), atualizado de
+        forma incremental.
+        """
+        if tokens is None:
+            tokens = self.get_tokenized_document(document_id)
+        rows = tokens.term_counts(nlp.stop_words)
+
+        with self.conn:
+            self._unindex_terms(document_id)
+            self.conn.executemany(
+                'INSERT INTO block_terms (content_id, document_id, term, tf) VALUES (?, ?, ?, ?)',
+                [(content_id, document_id, term, tf) for content_id, term, tf in rows]
+            )
+            self.conn.execute('''
+            INSERT INTO document_terms (document_id, term, tf, df)
+            SELECT document_id, term, SUM(tf), COUNT(*)
+            FROM block_terms
+            WHERE document_id = ?
+            GROUP BY term
+            ''', (document_id,))
+            self.conn.execute('''
+            INSERT INTO corpus_terms (term, df)
+            SELECT term, 1 FROM document_terms WHERE document_id = ?
+            ON CONFLICT (term) DO UPDATE SET df = df + 1
+            ''', (document_id,))
+
+    def _unindex_terms(self, document_id):
+        """Remove o documento do índice de termos (sem confirmar a transação)"""
+        self.conn.execute('''
+        UPDATE corpus_terms SET df = df - 1
+        WHERE term IN (SELECT term FROM document_terms WHERE document_id = ?)
+        ''', (document_id,))
+        self.conn.execute('DELETE FROM corpus_terms WHERE df <= 0')
+        self.conn.execute('DELETE FROM document_terms WHERE document_id = ?', (document_id,))
+        self.conn.execute('DELETE FROM block_terms WHERE document_id = ?', (document_id,))
+
+    def _document_block_count(self, document_id):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM content WHERE document_id = ?', (document_id,)
+        ).fetchone()[0]
+
+    def _ensure_terms_indexed(self, document_id):
+        """Indexa documentos importados antes do índice de termos"""
+        indexed = self.conn.execute(
+            'SELECT 1 FROM document_terms WHERE document_id = ? LIMIT 1', (document_id,)
+        ).fetchone()
+        if not indexed and self._document_block_count(document_id):
+            self.index_document_terms(document_id)
+
+    def keywords(self, tokens, num_keywords=5):
+        """Palavras-chave dos blocos de `tokens` (TokenizedDocument) pelo índice de termos"""
+        return self.get_keywords(np.unique(tokens.content_ids).tolist(), num_keywords)
+
+    def get_keywords(self, content_ids, num_keywords=5):
+        """Palavras-chave de um conjunto de blocos por TF-IDF.
+
+        tf é somado nos blocos indicados e o idf usa a frequência do termo
+        entre os blocos do mesmo documento.
+        """
+        ids = json.dumps([int(content_id) for content_id in content_ids])
+        for document_id, in self.conn.execute(
+            'SELECT DISTINCT document_id FROM content WHERE id IN (SELECT value FROM json_each(?))', (ids,)
+        ).fetchall():
+            self._ensure_terms_indexed(document_id)
+
+        rows = self.conn.execute('''
+        SELECT b.document_id, b.term, SUM(b.tf), d.df
+        FROM block_terms b
+        JOIN document_terms d ON d.document_id = b.document_id AND d.term = b.term
+        WHERE b.content_id IN (SELECT value FROM json_each(?))
+        GROUP BY b.document_id, b.term
+        ''', (ids,)).fetchall()
+
+        blocks = {}
+        scores = defaultdict(float)
+        for document_id, term, tf, df in rows:
+            if document_id not in blocks:
+                blocks[document_id] = self._document_block_count(document_id)
+            scores[term] += tf * (np.log((1.0 + blocks[document_id]) / (1.0 + df)) + 1.0)
+        return top_keywords(scores, num_keywords)
+
+    def get_document_keywords(self, document_id, num_keywords=10):
+        """Palavras-chave do documento inteiro, com idf calculado entre os documentos do acervo"""
+        self._ensure_terms_indexed(document_id)
+        documents = self.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        rows = self.conn.execute('''
+        SELECT d.term, d.tf, c.df
+        FROM document_terms d
+        JOIN corpus_terms c ON c.term = d.term
+        WHERE d.document_id = ?
+        ''', (document_id,)).fetchall()
+        return top_keywords(
+            {term: tf * (np.log((1.0 + documents) / (1.0 + df)) + 1.0) for term, tf, df in rows},
+            num_keywords
+        )
+
+    def get_term_weights(self, document_id):
+        """Pesos IDF dos termos do documento (TermWeights), para uso fora do banco"""
+        self._ensure_terms_indexed(document_id)
+        blocks = self._document_block_count(document_id)
+        rows = self.conn.execute(
+            'SELECT term, df FROM document_terms WHERE document_id = ?', (document_id,)
+        ).fetchall()
+        idf = {term: float(np.log((1.0 + blocks) / (1.0 + df)) + 1.0) for term, df in rows}
+        return TermWeights(idf, default=float(np.log(1.0 + blocks) + 1.0))
+
+    def save_tokenized_document(self, document_id, tokens):
+        """Salva a representação tokenizada, um registro por bloco"""
+        with self.conn:
+            self.conn.executemany('''
+            INSERT OR REPLACE INTO content_tokens (content_id, document_id, data)
+            VALUES (?, ?, ?)
+            ''', [(content_id, document_id, data) for content_id, data in tokens.to_rows()])
+
+    def build_tokenized_document(self, document_id):
+        """Tokeniza todos os blocos de um documento e guarda o resultado"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT id, text_content FROM content WHERE document_id = ? ORDER BY id', (document_id,)
+        )
+        tokens = TokenizedDocument.build(cursor.fetchall())
+        self.save_tokenized_document(document_id, tokens)
+        return tokens
+
+    def get_tokenized_document(self, document_id):
+        """Obtém o documento tokenizado, tokenizando-o na primeira vez.
+
+        Blocos podem ter sido tokenizados um a um (get_tokenized_content);
+        os que ainda não têm tokens são tokenizados e guardados agora, para
+        que o documento volte sempre completo.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT content_id, data FROM content_tokens WHERE document_id = ? ORDER BY content_id',
+            (document_id,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return self.build_tokenized_document(document_id)
+
+        cursor.execute('''
+        SELECT c.id, c.text_content
+        FROM content c
+        LEFT JOIN content_tokens t ON t.content_id = c.id
+        WHERE c.document_id = ? AND t.content_id IS NULL
+        ORDER BY c.id
+        ''', (document_id,))
+        missing = cursor.fetchall()
+        if missing:
+            tokens = TokenizedDocument.build(missing)
+            self.save_tokenized_document(document_id, tokens)
+            rows = sorted(rows + tokens.to_rows(), key=lambda row: row[0])
+        return TokenizedDocument.from_rows(rows)
+
+    def get_tokenized_content(self, content_id):
+        """Obtém a representação tokenizada de um único bloco"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT content_id, data FROM content_tokens WHERE content_id = ?', (content_id,))
+        row = cursor.fetchone()
+        if row:
+            return TokenizedDocument.from_rows([row])
+
+        cursor.execute('SELECT document_id, text_content FROM content WHERE id = ?', (content_id,))
+        row = cursor.fetchone()
+        if not row:
+            return TokenizedDocument.build([])
+        tokens = TokenizedDocument.from_text(row[1], content_id)
+        self.save_tokenized_document(row[0], tokens)
+        return tokens
+
+    def search_content(self, query, limit=20, document_id=None):
+        """Busca textual no conteúdo, retornando trechos ordenados por relevância (BM25)"""
+        match = fts_query(query)
+        if not match:
+            return []
+
+        params = [match]
+        document_filter = ''
+        if document_id:
+            document_filter = 'AND c.document_id = ?'
+            params.append(document_id)
+        params.append(limit)
+
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+        SELECT c.id, c.document_id, d.title, c.page, c.chapter, c.theme,
+               snippet(content_fts, 0, '**', '**', ' … ', 16) AS excerpt
+        FROM content_fts
+        JOIN content c ON c.id = content_fts.rowid
+        JOIN documents d ON d.id = c.document_id
+        WHERE content_fts MATCH ? {document_filter}
+        ORDER BY bm25(content_fts, 1.0, 4.0, 2.0, 2.0)
+        LIMIT ?
+        ''', params)
+
+        return [
+            {
+                'content_id': row[0],
+                'document_id': row[1],
+                'title': row[2],
+                'page': row[3],
+                'chapter': row[4],
+                'theme': row[5],
+                'snippet': row[6]
+            }
+            for row in cursor.fetchall()
+        ]
+
+    def find_document_by_hash(self, sha256):
+        """Retorna o id do documento já processado com este hash, se existir"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT d.id
+        FROM document_hashes h
+        JOIN documents d ON h.document_id = d.id
+        WHERE h.sha256 = ?
+        ''', (sha256,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def save_document_hash(self, document_id, sha256):
+        """Associa o hash do arquivo ao documento processado"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO document_hashes (sha256, document_id)
+        VALUES (?, ?)
+        ''', (sha256, document_id))
+        self.conn.commit()
+
+    def get_cached_pages(self, page_hashes):
+        """Obtém as páginas já extraídas, indexadas pela impressão digital"""
+        cursor = self.conn.cursor()
+        cached = {}
+        unique_hashes = list(set(page_hashes))
+
+        # Consulta em lotes para respeitar o limite de parâmetros do SQLite
+        for i in range(0, len(unique_hashes), 500):
+            batch = unique_hashes[i:i + 500]
+            cursor.execute(f'''
+            SELECT page_hash, text_content, source, large_lines
+            FROM page_cache
+            WHERE page_hash IN ({', '.join('?' * len(batch))})
+            ''', batch)
+            for page_hash, text, source, large_lines in cursor.fetchall():
+                cached[page_hash] = {
+                    'text': text,
+                    'source': source,
+                    'large_lines': json.loads(large_lines) if large_lines is not None else None
+                }
+
+        return cached
+
+    def save_cached_pages(self, pages):
+        """Salva páginas extraídas no cache (page_hash, texto, origem, linhas em fonte grande)"""
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+        INSERT OR REPLACE INTO page_cache (page_hash, text_content, source, large_lines, created_date)
+        VALUES (?, ?, ?, ?, datetime('now'))
+        ''', [
+            (page_hash, text, source, json.dumps(large_lines, ensure_ascii=False) if large_lines is not None else None)
+            for page_hash, text, source, large_lines in pages
+        ])
         self.conn.commit()
 
     def get_documents(self):
@@ -468,13 +2621,101 @@ class DatabaseManager:
     def save_flashcard(self, content_id, question, answer):
         """Salva um flashcard"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-        INSERT INTO flashcards (content_id, question, answer, created_date)
-        VALUES (?, ?, ?, datetime('now'))
-        ''', (content_id, question, answer))
+        cursor.execute(INSERT_FLASHCARD_SQL, (content_id, question, answer))
         self.conn.commit()
         return cursor.lastrowid
 
+    def save_flashcards(self, flashcards):
+        """Salva vários flashcards (content_id, pergunta, resposta) em uma única transação"""
+        rows = list(flashcards)
+        with self.conn:
+            self.conn.executemany(INSERT_FLASHCARD_SQL, rows)
+        return len(rows)
+
+    def iter_document_content(self, document_id, batch_size=CONTENT_BATCH_SIZE):
+        """Gera (capítulo, tema, subtema, página, texto) na ordem de leitura, lendo em lotes"""
+        cursor = self.conn.execute('''
+        SELECT chapter, theme, subtheme, page, text_content
+        FROM content
+        WHERE document_id = ?
+        ORDER BY id
+        ''', (document_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def iter_flashcards(self, batch_size=500):
+        """Gera (pergunta, resposta) de todos os flashcards, lendo em lotes"""
+        cursor = self.conn.execute('SELECT question, answer FROM flashcards ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def get_flashcard_content_ids(self, document_id):
+        """Blocos do documento que já têm flashcards"""
+        cursor = self.conn.execute('''
+        SELECT DISTINCT f.content_id
+        FROM flashcards f
+        JOIN content c ON c.id = f.content_id
+        WHERE c.document_id = ?
+        ''', (document_id,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def generate_document_flashcards(self, document_id, generator=None):
+        """Gera e grava, em uma transação, flashcards para todos os blocos sem cartões"""
+        generator = generator or FlashcardGenerator()
+        rows = generator.for_document(
+            self.get_tokenized_document(document_id), skip=self.get_flashcard_content_ids(document_id)
+        )
+        return self.save_flashcards(rows)
+
+    def get_due_flashcards(self, limit=20, now=None):
+        """Próximos `limit` flashcards com revisão vencida, do mais atrasado ao mais recente"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT f.id, f.question, f.answer, c.chapter, c.theme, f.ease, f.interval_days, f.repetitions, f.due_date
+        FROM flashcards f
+        LEFT JOIN content c ON f.content_id = c.id
+        WHERE f.due_date <= ?
+        ORDER BY f.due_date
+        LIMIT ?
+        ''', (now or sql_datetime(), limit))
+        keys = ('id', 'question', 'answer', 'chapter', 'theme', 'ease', 'interval', 'repetitions', 'due_date')
+        return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    def count_due_flashcards(self, now=None):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM flashcards WHERE due_date <= ?', (now or sql_datetime(),)
+        ).fetchone()[0]
+
+    def next_flashcard_due(self):
+        """Data da próxima revisão agendada (None se não há flashcards)"""
+        return self.conn.execute('SELECT MIN(due_date) FROM flashcards').fetchone()[0]
+
+    def review_flashcard(self, flashcard_id, grade, scheduler=None, now=None):
+        """Registra uma resposta (nota de 0 a 5) e agenda a próxima revisão"""
+        scheduler = scheduler or SM2Scheduler()
+        row = self.conn.execute(
+            'SELECT ease, interval_days, repetitions FROM flashcards WHERE id = ?', (flashcard_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        ease, interval, repetitions, due_date = scheduler.review(*row, grade, now=now)
+        difficulty = 1 if grade >= 5 else 2 if grade >= 4 else 3
+        with self.conn:
+            self.conn.execute('''
+            UPDATE flashcards
+            SET ease = ?, interval_days = ?, repetitions = ?, due_date = ?,
+                difficulty = ?, last_reviewed = datetime('now')
+            WHERE id = ?
+            ''', (ease, interval, repetitions, due_date, difficulty, flashcard_id))
+        return due_date
+
     def get_flashcards(self):
         """Obtém todos os flashcards"""
         cursor = self.conn.cursor()
@@ -489,269 +2730,983 @@ class DatabaseManager:
     def save_question(self, content_id, question_data):
         """Salva uma questão no banco de dados"""
         cursor = self.conn.cursor()
+        cursor.execute(INSERT_QUESTION_SQL, self._question_row(content_id, question_data))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def save_questions(self, questions):
+        """Salva várias questões (content_id, dados da questão) em uma única transação"""
+        rows = [self._question_row(content_id, question_data) for content_id, question_data in questions]
+        with self.conn:
+            self.conn.executemany(INSERT_QUESTION_SQL, rows)
+        return len(rows)
+
+    def start_question_job(self, document_id):
+        """Cria ou retoma o registro de progresso do banco de questões do documento"""
+        total = self.conn.execute(
+            'SELECT COUNT(*) FROM content WHERE document_id = ?', (document_id,)
+        ).fetchone()[0]
+        job = self.get_question_job(document_id)
+
+        with self.conn:
+            if job is None:
+                self.conn.execute('''
+                INSERT INTO question_jobs (document_id, status, blocks_total, updated_date)
+                VALUES (?, 'running', ?, datetime('now'))
+                ''', (document_id, total))
+            else:
+                self.conn.execute('''
+                UPDATE question_jobs
+                SET status = 'running', blocks_total = ?, error = NULL, updated_date = datetime('now')
+                WHERE document_id = ?
+                ''', (total, document_id))
+        return self.get_question_job(document_id)
+
+    def get_question_job(self, document_id):
+        """Progresso da geração do banco de questões (None se nunca iniciada)"""
+        row = self.conn.execute('''
+        SELECT status, last_content_id, blocks_done, blocks_total, questions, error, updated_date
+        FROM question_jobs
+        WHERE document_id = ?
+        ''', (document_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ('status', 'last_content_id', 'blocks_done', 'blocks_total', 'questions', 'error', 'updated_date')
+        return dict(zip(keys, row))
+
+    def get_pending_content(self, document_id, after_id, limit):
+        """Próximos blocos (id, texto) do documento depois do ponto de controle"""
+        return self.conn.execute('''
+        SELECT id, text_content
+        FROM content
+        WHERE document_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+        ''', (document_id, after_id, limit)).fetchall()
+
+    def save_question_batch(self, document_id, questions, last_content_id, blocks):
+        """Insere um lote de questões e avança o ponto de controle na mesma transação.
+
+        Se a geração for interrompida, o lote inteiro ou nada foi gravado,
+        então a retomada nunca duplica nem perde questões.
+        """
+        rows = [self._question_row(question['content_id'], question) for question in questions]
+        with self.conn:
+            self.conn.executemany(INSERT_QUESTION_SQL, rows)
+            self.conn.execute('''
+            UPDATE question_jobs
+            SET last_content_id = ?, blocks_done = blocks_done + ?, questions = questions + ?,
+                updated_date = datetime('now')
+            WHERE document_id = ?
+            ''', (last_content_id, blocks, len(rows), document_id))
+
+    def finish_question_job(self, document_id, error=None):
+        with self.conn:
+            self.conn.execute('''
+            UPDATE question_jobs SET status = ?, error = ?, updated_date = datetime('now')
+            WHERE document_id = ?
+            ''', ('failed' if error else 'done', error, document_id))
+
+    def iter_question_texts(self, document_id):
+        """Enunciado e resposta das questões já geradas para o documento"""
+        cursor = self.conn.execute('''
+        SELECT q.question_text, q.correct_answer
+        FROM questions q
+        JOIN content c ON c.id = q.content_id
+        WHERE c.document_id = ?
+        ''', (document_id,))
+        for question_text, answer in cursor:
+            yield f"{question_text} {answer}"
+
+    def _question_row(self, content_id, question_data):
+        """Converte os dados de uma questão em uma linha da tabela questions"""
         options = json.dumps(question_data.get('options', [])) if 'options' in question_data else None
 
-        cursor.execute('''
-        INSERT INTO questions (
-            content_id, question_type, question_text, options, 
-            correct_answer, explanation, difficulty, created_date
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
-        ''', (
+        # Verdadeiro/falso usa 'statement' e estudo de caso traz um contexto
+        question_text = question_data.get('question') or question_data.get('statement', '')
+        if question_data.get('context'):
+            question_text = f"{question_data['context']}\n\n{question_text}"
+
+        return (
             content_id,
             question_data['type'],
-            question_data['question'],
+            question_text,
             options,
-            question_data['answer'],
+            str(question_data['answer']),
             question_data.get('explanation', ''),
             question_data.get('difficulty', 1)
-        ))
-        self.conn.commit()
-        return cursor.lastrowid
+        )
 
     def get_questions(self, question_type=None):
         """Obtém questões do banco de dados"""
-        cursor = self.conn.cursor()
+        return self.get_questions_page(page_size=None, question_type=question_type)
+
+    def _question_filters(self, filters):
+        """Cláusula WHERE para filtros {nome: valor ou lista de valores}"""
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is None or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            column = QUESTION_COLUMNS[name]
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return ('WHERE ' + ' AND '.join(clauses) if clauses else ''), params
 
-        if question_type:
-            cursor.execute('''
-            SELECT q.id, q.question_text, q.options, q.correct_answer, q.explanation, c.chapter, c.theme
-            FROM questions q
-            JOIN content c ON q.content_id = c.id
-            WHERE q.question_type = ?
-            ''', (question_type,))
-        else:
-            cursor.execute('''
-            SELECT q.id, q.question_text, q.options, q.correct_answer, q.explanation, c.chapter, c.theme
-            FROM questions q
-            JOIN content c ON q.content_id = c.id
-            ''')
+    @staticmethod
+    def _question_dict(row):
+        return {
+            'id': row[0],
+            'question': row[1],
+            'options': json.loads(row[2]) if row[2] else None,
+            'answer': row[3],
+            'explanation': row[4],
+            'chapter': row[5],
+            'theme': row[6],
+            'type': row[7],
+            'difficulty': row[8]
+        }
+
+    def count_questions(self, **filters):
+        where, params = self._question_filters(filters)
+        return self.conn.execute(f'''
+        SELECT COUNT(*)
+        FROM questions q
+        JOIN content c ON q.content_id = c.id
+        {where}
+        ''', params).fetchone()[0]
+
+    def get_questions_page(self, page_size=20, after_id=0, **filters):
+        """Uma página do banco de questões: as `page_size` seguintes à questão `after_id`.
+
+        Paginação por chave (q.id > ?) sobre a chave primária: qualquer
+        página custa o mesmo que a primeira, ao contrário de OFFSET.
+        """
+        where, params = self._question_filters(filters)
+        where = f"{where} {'AND' if where else 'WHERE'} q.id > ?"
+        params.append(after_id or 0)
+        limit = ''
+        if page_size:
+            limit = 'LIMIT ?'
+            params.append(page_size)
+
+        cursor = self.conn.execute(f'{QUESTION_SELECT_SQL} {where} ORDER BY q.id {limit}', params)
+        return [self._question_dict(row) for row in cursor.fetchall()]
+
+    def question_bank_version(self):
+        """Muda quando questões ou documentos são incluídos ou removidos (consultas O(1))"""
+        return self.conn.execute(
+            'SELECT (SELECT MAX(id) FROM questions), (SELECT MAX(id) FROM documents), '
+            '(SELECT COUNT(*) FROM documents)'
+        ).fetchone()
+
+    def _question_strata(self, by, filters):
+        """[((valores das colunas `by`), quantidade)]
+
+        As questões são agregadas primeiro por (tipo, dificuldade, bloco)
+        sobre o índice idx_questions_type_difficulty, sem ler a tabela; só
+        os grupos, não cada questão, são juntados a content.
+        """
+        where, params = self._question_filters(filters)
+        columns = ', '.join(QUESTION_COLUMNS[name] for name in by) or "'Todas'"
+        cursor = self.conn.execute(f'''
+        SELECT {columns}, SUM(q.questions)
+        FROM (
+            SELECT question_type, difficulty, content_id, COUNT(*) AS questions
+            FROM questions
+            GROUP BY question_type, difficulty, content_id
+        ) q
+        JOIN content c ON q.content_id = c.id
+        {where}
+        GROUP BY {columns}
+        ORDER BY {columns}
+        ''', params)
+        return [(tuple(row[:-1]), row[-1]) for row in cursor.fetchall()]
+
+    def question_strata(self, by, **filters):
+        """Tamanho de cada estrato: [((valores das colunas `by`), quantidade)]"""
+        return self._question_strata(by, filters)
+
+    def _sample_question_ids(self, filters, size, quota):
+        """Sorteia `quota` ids de um estrato de `size` questões sem ordenar o estrato.
+
+        Sorteia as posições (postos) e percorre os ids do estrato uma única
+        vez, na ordem em que o SQLite os devolve pelo índice, parando no
+        último posto sorteado. Toda questão tem a mesma chance, não importa
+        como os ids do estrato estão espalhados.
+        """
+        where, params = self._question_filters(filters)
+        ranks = sorted(random.sample(range(size), min(quota, size)))
+        if not ranks:
+            return []
+
+        cursor = self.conn.execute(
+            f'SELECT q.id FROM questions q JOIN content c ON q.content_id = c.id {where}', params
+        )
+        chosen = []
+        try:
+            for rank, (question_id,) in enumerate(cursor):
+                if rank == ranks[len(chosen)]:
+                    chosen.append(question_id)
+                    if len(chosen) == len(ranks):
+                        break
+        finally:
+            cursor.close()
+        return chosen
+
+    def sample_questions(self, count, by=(), proportional=True, **filters):
+        """Sorteia um simulado de `count` questões com cotas por estrato.
+
+        Os estratos (combinações das colunas `by`) e seus tamanhos saem de
+        um GROUP BY; cada cota é sorteada pelo índice
+        (_sample_question_ids) e só as questões escolhidas saem do banco.
+        """
+        strata = self._question_strata(by, filters)
+        quotas = stratified_quotas([size for _, size in strata], count, proportional)
+
+        ids = []
+        for (values, size), quota in zip(strata, quotas):
+            if quota:
+                stratum = dict(filters, **dict(zip(by, values)))
+                ids.extend(self._sample_question_ids(stratum, size, quota))
 
         questions = []
-        for row in cursor.fetchall():
-            options = json.loads(row[2]) if row[2] else None
-            questions.append({
-                'id': row[0],
-                'question': row[1],
-                'options': options,
-                'answer': row[3],
-                'explanation': row[4],
-                'chapter': row[5],
-                'theme': row[6]
-            })
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor = self.conn.execute(
+                f"{QUESTION_SELECT_SQL} WHERE q.id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            questions.extend(self._question_dict(row) for row in cursor.fetchall())
 
+        random.shuffle(questions)
         return questions
 
     def close(self):
-        """Fecha a conexão com o banco de dados"""
-        self.conn.close()
-
-
-class ExportManager:
-    def __init__(self):
-        pass
-
-    def export_txt(self, content, filename):
-        """Exporta conteúdo para TXT"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            if isinstance(content, dict):
-                for chapter, chapter_data in content.get('chapters', {}).items():
-                    f.write(f"CAPÍTULO: {chapter}\n\n")
-                    for theme, theme_data in chapter_data.get('themes', {}).items():
-                        f.write(f"TEMA: {theme}\n")
-                        for subtheme, blocks in theme_data.get('subthemes', {}).items():
-                            f.write(f"Subtema: {subtheme}\n")
-                            for block in blocks:
-                                f.write(f"Página {block['page']}:\n{block['text']}\n\n")
-            else:
-                f.write(content)
-        return filename
-
-    def export_pdf(self, content, filename):
-        """Exporta conteúdo para PDF"""
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        if isinstance(content, dict):
-            for chapter, chapter_data in content.get('chapters', {}).items():
-                pdf.cell(200, 10, txt=f"CAPÍTULO: {chapter}", ln=True)
-                pdf.ln(5)
-
-                for theme, theme_data in chapter_data.get('themes', {}).items():
-                    pdf.cell(200, 10, txt=f"TEMA: {theme}", ln=True)
-
-                    for subtheme, blocks in theme_data.get('subthemes', {}).items():
-                        pdf.cell(200, 10, txt=f"Subtema: {subtheme}", ln=True)
-
-                        for block in blocks:
-                            pdf.multi_cell(0, 10, txt=f"Página {block['page']}:\n{block['text']}")
-                            pdf.ln(5)
-        else:
-            pdf.multi_cell(0, 10, txt=content)
-
-        pdf.output(filename)
-        return filename
+        """Fecha as conexões com o banco de dados"""
+        self.pool.close()
+
+
+class ResultCache:
+    """Memoização de resumos, palavras-chave e questões em dois níveis.
+
+    O primeiro nível é um LRU em memória compartilhado pelas sessões do
+    processo; o segundo é a tabela computation_cache, que sobrevive a
+    reinicializações. Os dois são limitados por tamanho e o persistente
+    também por idade.
+
+    Leituras não escrevem no banco: o último uso de cada entrada fica em
+    memória e é gravado de uma vez antes da remoção das menos usadas.
+    """
+
+    def __init__(self, db, max_entries=512, max_memory_bytes=32 * 1024 * 1024,
+                 max_disk_bytes=256 * 1024 * 1024, max_age_days=60, evict_every=50):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_days = max_age_days
+        self.evict_every = evict_every
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._touched = {}
+
+    @staticmethod
+    def make_key(kind, text, **params):
+        """Chave: hash do texto + tipo do cálculo + parâmetros"""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(f"{kind}|{digest}|{payload}".encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, kind, text, compute, **params):
+        """Retorna o resultado memorizado ou calcula e armazena"""
+        key = self.make_key(kind, text, **params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, kind, value)
+        return value
+
+    def peek(self, kind, text, **params):
+        """Retorna o resultado memorizado sem calcular (None se ausente)"""
+        return self.get(self.make_key(kind, text, **params))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touched[key] = sql_datetime()
+                return self._memory[key][0]
+
+        row = self.db.conn.execute(
+            'SELECT value FROM computation_cache WHERE cache_key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
 
-    def export_docx(self, content, filename):
-        """Exporta conteúdo para DOCX"""
-        doc = Document()
+        with self._lock:
+            self._touched[key] = sql_datetime()
+        value = json.loads(row[0])
+        self._remember(key, value, len(row[0]))
+        return value
+
+    def put(self, key, kind, value):
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self.db.conn:
+            self.db.conn.execute('''
+            INSERT OR REPLACE INTO computation_cache (cache_key, kind, value, size, created_date, last_used)
+            VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))
+            ''', (key, kind, serialized, len(serialized)))
+        self._remember(key, value, len(serialized))
+
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+    def flush_usage(self):
+        """Grava em uma transação os últimos usos acumulados em memória"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            with self.db.conn:
+                self.db.conn.executemany(
+                    'UPDATE computation_cache SET last_used = ? WHERE cache_key = ?',
+                    [(used, key) for key, used in touched.items()]
+                )
 
-        if isinstance(content, dict):
-            for chapter, chapter_data in content.get('chapters', {}).items():
-                doc.add_heading(f"CAPÍTULO: {chapter}", level=1)
+    def evict(self):
+        """Remove do nível persistente as entradas vencidas e as menos usadas além do limite"""
+        self.flush_usage()
+        conn = self.db.conn
+        with conn:
+            conn.execute(
+                "DELETE FROM computation_cache WHERE created_date < datetime('now', ?)",
+                (f'-{self.max_age_days} days',)
+            )
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM computation_cache').fetchone()[0]
+            if total > self.max_disk_bytes:
+                # Apaga as menos usadas até voltar ao limite
+                conn.execute('''
+                DELETE FROM computation_cache
+                WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key, SUM(size) OVER (ORDER BY last_used DESC) AS running
+                        FROM computation_cache
+                    )
+                    WHERE running > ?
+                )
+                ''', (self.max_disk_bytes,))
+
+    def clear(self):
+        """Esvazia os dois níveis"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._touched.clear()
+        with self.db.conn:
+            self.db.conn.execute('DELETE FROM computation_cache')
+
+    def _remember(self, key, value, size):
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            self._memory[key] = (value, size)
+            self._memory_bytes += size
+
+            while self._memory and (
+                len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes
+            ):
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+
+
+# Formatos de exportação -> tipo MIME do download
+EXPORT_FORMATS = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'txt': 'text/plain',
+    'md': 'text/markdown',
+    'html': 'text/html',
+}
+
+
+@contextlib.contextmanager
+def text_output(output):
+    """Abre `output` para escrita de texto UTF-8 (caminho ou arquivo binário/texto)"""
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'w', encoding='utf-8') as f:
+            yield f
+    elif isinstance(output, TextIOBase):
+        yield output
+    else:
+        wrapper = TextIOWrapper(output, encoding='utf-8', newline='')
+        try:
+            yield wrapper
+        finally:
+            wrapper.flush()
+            wrapper.detach()
+
+
+class TextBackend:
+    """Texto puro, escrito nó a nó"""
+
+    def render(self, nodes, output):
+        with text_output(output) as f:
+            in_list = False
+            for kind, *values in nodes:
+                if in_list and kind != 'item':
+                    f.write("\n")
+                in_list = kind == 'item'
+
+                if kind == 'heading':
+                    level, text = values
+                    f.write(f"{text}\n\n" if level == 1 else f"{text}\n")
+                elif kind == 'paragraph':
+                    f.write(f"{values[0]}\n\n")
+                elif kind == 'item':
+                    f.write(f"   {values[0]}\n")
+                else:
+                    f.write("\n\n")
+
+
+class MarkdownBackend:
+    """Markdown, escrito nó a nó"""
+
+    def render(self, nodes, output):
+        with text_output(output) as f:
+            in_list = False
+            for kind, *values in nodes:
+                if in_list and kind != 'item':
+                    f.write("\n")
+                in_list = kind == 'item'
+
+                if kind == 'heading':
+                    level, text = values
+                    f.write(f"{'#' * level} {text}\n\n")
+                elif kind == 'paragraph':
+                    f.write(values[0].replace("\n", "  \n") + "\n\n")
+                elif kind == 'item':
+                    f.write(f"- {values[0]}\n")
+                else:
+                    f.write("---\n\n")
+            if in_list:
+                f.write("\n")
 
-                for theme, theme_data in chapter_data.get('themes', {}).items():
-                    doc.add_heading(f"TEMA: {theme}", level=2)
 
-                    for subtheme, blocks in theme_data.get('subthemes', {}).items():
-                        doc.add_heading(f"Subtema: {subtheme}", level=3)
+class HTMLBackend:
+    """Página HTML, escrita nó a nó (quebras de página valem na impressão)"""
+
+    def render(self, nodes, output):
+        with text_output(output) as f:
+            f.write('<!DOCTYPE html>\n<html lang="pt-BR">\n<head><meta charset="utf-8"><title>EstudaZilla</title></head>\n<body>\n')
+            in_list = False
+            for kind, *values in nodes:
+                if in_list and kind != 'item':
+                    f.write("</ul>\n")
+                elif kind == 'item' and not in_list:
+                    f.write("<ul>\n")
+                in_list = kind == 'item'
+
+                if kind == 'heading':
+                    level, text = values
+                    f.write(f"<h{level}>{html.escape(text)}</h{level}>\n")
+                elif kind == 'paragraph':
+                    f.write(f"<p>{html.escape(values[0]).replace(chr(10), '<br>')}</p>\n")
+                elif kind == 'item':
+                    f.write(f"<li>{html.escape(values[0])}</li>\n")
+                else:
+                    f.write('<hr style="page-break-after: always">\n')
+            if in_list:
+                f.write("</ul>\n")
+            f.write("</body>\n</html>\n")
 
-                        for block in blocks:
-                            doc.add_paragraph(f"Página {block['page']}:")
-                            doc.add_paragraph(block['text'])
-                            doc.add_paragraph()
-        else:
-            doc.add_paragraph(content)
 
-        doc.save(filename)
-        return filename
+class PDFBackend:
+    """PDF com as fontes padrão do FPDF (que só aceitam latin-1)"""
 
-    def export_quiz(self, questions, filename, format='pdf'):
-        """Exporta um quiz para o formato especificado"""
-        if format == 'pdf':
-            return self._export_quiz_pdf(questions, filename)
-        elif format == 'docx':
-            return self._export_quiz_docx(questions, filename)
-        else:
-            return self._export_quiz_txt(questions, filename)
+    @staticmethod
+    def _text(text):
+        return str(text).encode('latin-1', 'replace').decode('latin-1')
 
-    def _export_quiz_pdf(self, questions, filename):
-        """Exporta quiz para PDF"""
+    def render(self, nodes, output):
         pdf = FPDF()
         pdf.add_page()
         pdf.set_font("Arial", size=12)
 
-        pdf.cell(200, 10, txt="SIMULADO GERADO PELO ESTUDAZILLA", ln=True)
-        pdf.ln(10)
-
-        for i, question in enumerate(questions, 1):
-            pdf.cell(200, 10, txt=f"{i}. {question['question']}", ln=True)
+        for kind, *values in nodes:
+            if kind == 'heading':
+                level, text = values
+                pdf.multi_cell(0, 10, txt=self._text(text))
+                if level == 1:
+                    pdf.ln(5)
+            elif kind == 'paragraph':
+                pdf.multi_cell(0, 10, txt=self._text(values[0]))
+                pdf.ln(5)
+            elif kind == 'item':
+                pdf.multi_cell(0, 10, txt=self._text(f"   {values[0]}"))
+            else:
+                pdf.add_page()
 
-            if question.get('options'):
-                for j, option in enumerate(question['options'], 1):
-                    pdf.cell(200, 10, txt=f"   {chr(96 + j)}) {option}", ln=True)
+        data = pdf.output(dest='S')
+        data = data.encode('latin-1') if isinstance(data, str) else bytes(data)
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, 'wb') as f:
+                f.write(data)
+        else:
+            output.write(data)
 
-            pdf.ln(5)
 
-        # Adiciona gabarito em uma nova página
-        pdf.add_page()
-        pdf.cell(200, 10, txt="GABARITO", ln=True)
-        pdf.ln(10)
+class DocxBackend:
+    """Documento do Word (python-docx)"""
 
-        for i, question in enumerate(questions, 1):
-            answer = question['answer']
-            if question.get('options'):
-                # Encontra o índice da resposta correta
-                try:
-                    idx = question['options'].index(answer)
-                    answer = f"{chr(97 + idx)}) {answer}"
-                except ValueError:
-                    pass
-
-            pdf.cell(200, 10, txt=f"{i}. {answer}", ln=True)
-            if 'explanation' in question:
-                pdf.multi_cell(0, 10, txt=f"   Explicação: {question['explanation']}")
-            pdf.ln(5)
+    def render(self, nodes, output):
+        doc = Document()
+        for kind, *values in nodes:
+            if kind == 'heading':
+                level, text = values
+                doc.add_heading(text, level=level)
+            elif kind == 'paragraph':
+                doc.add_paragraph(values[0])
+            elif kind == 'item':
+                doc.add_paragraph(values[0], style='List Bullet')
+            else:
+                doc.add_page_break()
+        doc.save(output)
 
-        pdf.output(filename)
-        return filename
 
-    def _export_quiz_docx(self, questions, filename):
-        """Exporta quiz para DOCX"""
-        doc = Document()
-        doc.add_heading('SIMULADO GERADO PELO ESTUDAZILLA', level=1)
+# Formato -> backend de renderização
+EXPORT_BACKENDS = {
+    'txt': TextBackend,
+    'md': MarkdownBackend,
+    'html': HTMLBackend,
+    'pdf': PDFBackend,
+    'docx': DocxBackend,
+}
 
-        for i, question in enumerate(questions, 1):
-            doc.add_paragraph(f"{i}. {question['question']}")
 
-            if question.get('options'):
-                for j, option in enumerate(question['options'], 1):
-                    doc.add_paragraph(f"   {chr(96 + j)}) {option}", style='ListBullet')
+class ExportManager:
+    """Exporta conteúdo, resumos, simulados e flashcards.
+
+    Cada exportação percorre os dados uma única vez gerando a árvore de
+    renderização: uma sequência de nós ('heading', nível, texto),
+    ('paragraph', texto), ('item', texto) e ('page_break',), em que os
+    níveis dos títulos dão a hierarquia. Os backends de EXPORT_BACKENDS
+    transformam os nós em TXT, Markdown, HTML, PDF ou DOCX. Para um único
+    formato os nós são consumidos enquanto são gerados; em export_many a
+    árvore é montada uma vez e renderizada em cada formato.
+
+    `output` pode ser um caminho ou um objeto de arquivo (ex.: BytesIO).
+    """
+
+    def __init__(self, backends=None):
+        self.backends = {name: backend() for name, backend in (backends or EXPORT_BACKENDS).items()}
+
+    @staticmethod
+    def content_nodes(content):
+        """Nós de um texto ou de conteúdo estruturado.
+
+        Aceita o dicionário de structure_blocks ou um iterável de linhas
+        (capítulo, tema, subtema, página, texto) na ordem de leitura, como
+        DatabaseManager.iter_document_content.
+        """
+        if isinstance(content, str):
+            yield 'paragraph', content
+            return
 
-            doc.add_paragraph()
+        if isinstance(content, dict):
+            content = (
+                (chapter, theme, subtheme, block['page'], block['text'])
+                for chapter, chapter_data in content.get('chapters', {}).items()
+                for theme, theme_data in chapter_data.get('themes', {}).items()
+                for subtheme, blocks in theme_data.get('subthemes', {}).items()
+                for block in blocks
+            )
 
-        # Adiciona gabarito
-        doc.add_page_break()
-        doc.add_heading('GABARITO', level=1)
+        current = (None, None, None)
+        for chapter, theme, subtheme, page, text in content:
+            if chapter != current[0]:
+                yield 'heading', 1, f"CAPÍTULO: {chapter}"
+            if (chapter, theme) != current[:2]:
+                yield 'heading', 2, f"TEMA: {theme}"
+            if (chapter, theme, subtheme) != current:
+                yield 'heading', 3, f"Subtema: {subtheme}"
+            current = (chapter, theme, subtheme)
+            yield 'paragraph', f"Página {page}:\n{text}"
+
+    @staticmethod
+    def quiz_nodes(questions):
+        """Nós do simulado e do gabarito em uma única passada pelas questões.
+
+        A letra da resposta certa sai do mesmo laço que numera as opções;
+        o gabarito fica guardado e vai para uma nova página no final.
+        """
+        answer_key = []
+        yield 'heading', 1, "SIMULADO GERADO PELO ESTUDAZILLA"
 
         for i, question in enumerate(questions, 1):
+            yield 'paragraph', f"{i}. {question['question']}"
+
             answer = question['answer']
-            if question.get('options'):
-                # Encontra o índice da resposta correta
+            for j, option in enumerate(question.get('options') or ()):
+                yield 'item', f"{chr(97 + j)}) {option}"
+                if option == answer:
+                    answer = f"{chr(97 + j)}) {answer}"
+
+            answer_key.append(('paragraph', f"{i}. {answer}"))
+            if question.get('explanation'):
+                answer_key.append(('item', f"Explicação: {question['explanation']}"))
+
+        yield 'page_break',
+        yield 'heading', 1, "GABARITO"
+        yield from answer_key
+
+    @staticmethod
+    def flashcard_nodes(flashcards):
+        """Nós de pares (pergunta, resposta)"""
+        for question, answer in flashcards:
+            yield 'paragraph', f"Pergunta: {question}\nResposta: {answer}"
+
+    def render(self, nodes, output, format='pdf'):
+        """Renderiza os nós em um formato de EXPORT_BACKENDS"""
+        self.backends[format].render(nodes, output)
+        return output
+
+    def render_many(self, nodes, outputs):
+        """Monta a árvore uma vez e a renderiza em vários formatos ({formato: output})"""
+        nodes = list(nodes)
+        for format, output in outputs.items():
+            self.render(nodes, output, format)
+        return outputs
+
+    def export(self, content, output, format='pdf'):
+        """Exporta texto ou conteúdo estruturado"""
+        return self.render(self.content_nodes(content), output, format)
+
+    def export_quiz(self, questions, output, format='pdf'):
+        """Exporta um quiz com gabarito"""
+        return self.render(self.quiz_nodes(questions), output, format)
+
+    def export_flashcards(self, flashcards, output, format='pdf'):
+        """Exporta pares (pergunta, resposta) um a um, sem juntar tudo em uma string"""
+        return self.render(self.flashcard_nodes(flashcards), output, format)
+
+    def export_txt(self, content, output):
+        return self.export(content, output, 'txt')
+
+    def export_pdf(self, content, output):
+        return self.export(content, output, 'pdf')
+
+    def export_docx(self, content, output):
+        return self.export(content, output, 'docx')
+
+    def export_many(self, content, formats, kind='content'):
+        """Exporta o mesmo conteúdo em vários formatos: {formato: bytes}"""
+        nodes = getattr(self, f"{kind}_nodes")(content)
+        outputs = self.render_many(nodes, {format: BytesIO() for format in formats})
+        return {format: output.getvalue() for format, output in outputs.items()}
+
+
+# Tipo de exportação -> método do ExportManager
+EXPORT_KINDS = {
+    'document': 'export',
+    'summary': 'export',
+    'quiz': 'export_quiz',
+    'flashcards': 'export_flashcards',
+}
+
+
+class ExportService:
+    """Exportações em segundo plano com cache em disco dos arquivos gerados.
+
+    Cada arquivo é indexado pelo hash do conteúdo, pelo formato e pelo tipo
+    de exportação; pedir de novo o mesmo documento ou simulado devolve o
+    arquivo do cache sem gerar nada. O cache é limitado por tamanho e por
+    idade (sai primeiro o arquivo usado há mais tempo).
+    """
+
+    def __init__(self, exporter=None, workers=2, cache_dir=EXPORT_CACHE_DIR,
+                 max_cache_bytes=512 * 1024 * 1024, max_age_days=30):
+        self.exporter = exporter or ExportManager()
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.max_age_days = max_age_days
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='export-worker')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def content_digest(parts):
+        """Hash do conteúdo exportado (texto ou iterável de textos, linhas ou dicionários)"""
+        if isinstance(parts, str):
+            parts = [parts]
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    @staticmethod
+    def cache_key(kind, format, digest):
+        return hashlib.sha256(f"{kind}|{format}|{digest}".encode('utf-8')).hexdigest()
+
+    def submit(self, kind, format, digest, source):
+        """Enfileira a exportação e retorna a chave do arquivo.
+
+        `source` é chamado na thread do worker e devolve o conteúdo a
+        exportar (ex.: um gerador de linhas do banco). Nada é enfileirado
+        se o arquivo já está no cache ou sendo gerado.
+        """
+        key = self.cache_key(kind, format, digest)
+        with self._lock:
+            if os.path.exists(self._cache_path(key)):
+                return key
+            job = self._jobs.get(key)
+            if job is None or (job.done() and job.exception() is not None):
+                self._jobs[key] = self._executor.submit(self._run, key, kind, format, source)
+        return key
+
+    def status(self, key):
+        """'done', 'running', 'failed' ou None (arquivo desconhecido ou já removido do cache)"""
+        if os.path.exists(self._cache_path(key)):
+            return 'done'
+        job = self._jobs.get(key)
+        if job is None:
+            return None
+        if not job.done():
+            return 'running'
+        return 'failed' if job.exception() is not None else None
+
+    def error(self, key):
+        job = self._jobs.get(key)
+        return str(job.exception()) if job is not None and job.done() and job.exception() else None
+
+    def wait(self, key, timeout=None):
+        """Espera a exportação terminar por até `timeout` segundos; retorna o status"""
+        job = self._jobs.get(key)
+        if job is not None:
+            try:
+                job.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(key)
+
+    def result(self, key):
+        """Bytes do arquivo gerado (None se não está no cache)"""
+        path = self._cache_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Marca o uso: a remoção por tamanho começa pelos menos usados
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def shutdown(self):
+        """Encerra os workers após terminar as exportações em andamento"""
+        self._executor.shutdown(wait=True)
+
+    def evict(self, keep=None):
+        """Remove os arquivos vencidos e os menos usados além do limite de tamanho (exceto a chave `keep`)"""
+        files = []
+        cutoff = time.time() - self.max_age_days * 86400
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
                 try:
-                    idx = question['options'].index(answer)
-                    answer = f"{chr(97 + idx)}) {answer}"
-                except ValueError:
-                    pass
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_mtime < cutoff:
+                    self._remove(path)
+                else:
+                    files.append((stat.st_mtime, stat.st_size, path))
 
-            doc.add_paragraph(f"{i}. {answer}")
-            if 'explanation' in question:
-                doc.add_paragraph(f"   Explicação: {question['explanation']}")
-            doc.add_paragraph()
+        total = sum(size for _, size, _ in files)
+        kept = keep and self._cache_path(keep)
+        for _, size, path in sorted(files):
+            if total <= self.max_cache_bytes:
+                break
+            if path == kept:
+                continue
+            self._remove(path)
+            total -= size
+
+    def _run(self, key, kind, format, source):
+        buffer = BytesIO()
+        getattr(self.exporter, EXPORT_KINDS[kind])(source(), buffer, format=format)
+        self._write_cache(key, buffer.getvalue())
+        with self._lock:
+            self._jobs.pop(key, None)
+        self.evict(keep=key)
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _write_cache(self, key, data):
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Escrita atômica: quem consulta o status nunca vê um arquivo pela metade
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
-        doc.save(filename)
-        return filename
 
-    def _export_quiz_txt(self, questions, filename):
-        """Exporta quiz para TXT"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("SIMULADO GERADO PELO ESTUDAZILLA\n\n")
+# Interface do Streamlit
+@st.cache_resource
+def get_database():
+    """Acesso ao banco compartilhado pelas sessões (esquema configurado uma vez por processo)"""
+    return DatabaseManager()
+
+
+@st.cache_resource
+def get_result_cache():
+    """Cache de resumos e questões compartilhado pelas sessões"""
+    return ResultCache(get_database())
+
+
+class QuestionBankBuilder:
+    """Gera em segundo plano o banco de questões de documentos inteiros.
+
+    Uma thread por documento percorre os blocos de content em lotes, gera
+    os quatro tipos de questão com o QuizGenerator e grava cada lote junto
+    com o ponto de controle (question_jobs). Uma geração interrompida, por
+    erro ou reinício do processo, continua do último lote gravado.
+    """
+
+    def __init__(self, db, questions_per_block=8, batch_size=25, q_types=QUESTION_TYPES):
+        self.db = db
+        self.questions_per_block = questions_per_block
+        self.batch_size = batch_size
+        self.q_types = q_types
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._stop = threading.Event()
+
+    def start(self, document_id):
+        """Inicia ou retoma a geração; retorna False se já está em andamento ou concluída"""
+        with self._lock:
+            if self.is_running(document_id):
+                return False
+
+            job = self.db.get_question_job(document_id)
+            if job and job['status'] == 'done':
+                return False
+
+            self.db.start_question_job(document_id)
+            thread = threading.Thread(
+                target=self._run, args=(document_id,), name=f"question-bank-{document_id}", daemon=True
+            )
+            self._threads[document_id] = thread
+            thread.start()
+            return True
+
+    def is_running(self, document_id):
+        thread = self._threads.get(document_id)
+        return thread is not None and thread.is_alive()
+
+    def progress(self, document_id):
+        """Estado da geração; 'interrupted' quando não há thread para um job em andamento"""
+        job = self.db.get_question_job(document_id)
+        if job and job['status'] == 'running' and not self.is_running(document_id):
+            job['status'] = 'interrupted'
+        return job
+
+    def shutdown(self):
+        """Interrompe as gerações após o lote atual (o progresso fica salvo)"""
+        self._stop.set()
+        for thread in list(self._threads.values()):
+            thread.join()
+        self._threads.clear()
+        self._stop.clear()
+
+    def _run(self, document_id):
+        try:
+            generator = QuizGenerator()
+            tokens = self.db.get_tokenized_document(document_id)
+            # Alternativas erradas vêm do documento inteiro, não só do bloco
+            pool = DistractorPool(tokens.sentences)
+
+            # Retomada: as questões já gravadas continuam valendo na deduplicação
+            deduplicator = QuestionDeduplicator()
+            for text in self.db.iter_question_texts(document_id):
+                deduplicator.add_text(text)
+
+            last_id = self.db.get_question_job(document_id)['last_content_id']
+            while True:
+                if self._stop.is_set():
+                    return
+
+                blocks = self.db.get_pending_content(document_id, last_id, self.batch_size)
+                if not blocks:
+                    break
+
+                questions = []
+                for content_id, _ in blocks:
+                    questions.extend(generator.generate_bulk(
+                        tokens.for_content(content_id), self.questions_per_block, self.q_types, deduplicator, pool
+                    ))
+
+                last_id = blocks[-1][0]
+                self.db.save_question_batch(document_id, questions, last_id, len(blocks))
+
+            self.db.finish_question_job(document_id)
+        except Exception as e:
+            self.db.finish_question_job(document_id, error=str(e))
 
-            for i, question in enumerate(questions, 1):
-                f.write(f"{i}. {question['question']}\n")
 
-                if question.get('options'):
-                    for j, option in enumerate(question['options'], 1):
-                        f.write(f"   {chr(96 + j)}) {option}\n")
+@st.cache_resource
+def get_question_bank_builder():
+    """Gerador do banco de questões compartilhado pelas sessões do processo"""
+    return QuestionBankBuilder(get_database())
 
-                f.write("\n")
 
-            # Adiciona gabarito
-            f.write("\n\nGABARITO\n\n")
+@st.cache_resource
+def get_export_service():
+    """Exportações em segundo plano compartilhadas pelas sessões do processo"""
+    return ExportService()
 
-            for i, question in enumerate(questions, 1):
-                answer = question['answer']
-                if question.get('options'):
-                    # Encontra o índice da resposta correta
-                    try:
-                        idx = question['options'].index(answer)
-                        answer = f"{chr(97 + idx)}) {answer}"
-                    except ValueError:
-                        pass
-
-                f.write(f"{i}. {answer}\n")
-                if 'explanation' in question:
-                    f.write(f"   Explicação: {question['explanation']}\n")
-                f.write("\n")
 
-        return filename
+@st.cache_resource
+def get_ocr_service():
+    """Pool de OCR compartilhado por todas as sessões do processo"""
+    return OCRService()
 
 
-# Interface do Streamlit
 class EstudaZillaUI:
     def __init__(self):
-        self.db = DatabaseManager()
-        self.processor = PDFProcessor()
-        self.summarizer = ContentSummarizer()
+        self.db = get_database()
+        self.memo = get_result_cache()
+        self.question_bank = get_question_bank_builder()
+        self.processor = PDFProcessor(
+            workers=st.session_state.get('ingestion_workers'),
+            ocr_service=get_ocr_service(),
+            preprocessor=OCRPreprocessor(target_dpi=st.session_state.get('ocr_dpi', 300))
+        )
+        self.summarizer = ContentSummarizer(cache=self.memo, term_index=self.db)
         self.quiz_generator = QuizGenerator()
-        self.exporter = ExportManager()
+        self.flashcard_generator = FlashcardGenerator()
+        self.exports = get_export_service()
 
         # Configuração do estado da sessão
         if 'current_document' not in st.session_state:
             st.session_state.current_document = None
-        if 'current_content' not in st.session_state:
-            st.session_state.current_content = None
         if 'flashcards' not in st.session_state:
             st.session_state.flashcards = []
         if 'questions' not in st.session_state:
@@ -883,34 +3838,61 @@ class EstudaZillaUI:
             if uploaded_files:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
+                preview = st.empty()
 
                 for i, uploaded_file in enumerate(uploaded_files):
                     try:
+                        # Documento idêntico já processado: reaproveita o conteúdo salvo
+                        data = uploaded_file.getvalue()
+                        sha256 = file_digest(data)
+                        existing_id = self.db.find_document_by_hash(sha256)
+
+                        if existing_id:
+                            self._open_document(existing_id)
+                            st.info(f"{uploaded_file.name} já foi processado anteriormente. Conteúdo recuperado.")
+                            progress_bar.progress((i + 1) / len(uploaded_files))
+                            continue
+
                         # Salva o arquivo temporariamente
                         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                            tmp_file.write(uploaded_file.getvalue())
+                            tmp_file.write(data)
                             tmp_path = tmp_file.name
 
-                        # Processa o PDF
+                        # Processa o PDF, gravando cada lote de páginas assim que é extraído
                         status_text.text(f"Processando {uploaded_file.name}...")
-                        structured_content = self.processor.process_pdf(tmp_path)
-
-                        if structured_content:
-                            # Salva no banco de dados
-                            doc_id = self.db.save_document(uploaded_file.name, tmp_path)
-                            self.db.save_content(doc_id, structured_content)
+                        doc_id = self.db.save_document(uploaded_file.name, tmp_path)
+                        extraction = self.processor.extract(tmp_path, page_cache=self.db)
+                        try:
+                            blocks = self._track_progress(
+                                extraction, progress_bar, preview, i, len(uploaded_files)
+                            )
+                            saved = self.db.save_content_stream(doc_id, blocks)
+                        except Exception:
+                            self.db.delete_document(doc_id)
+                            raise
+                        finally:
+                            # Remove o arquivo temporário
+                            os.unlink(tmp_path)
+
+                        for page_num, error in extraction.errors:
+                            st.warning(f"Erro no OCR (página {page_num}): {error}")
+
+                        if saved:
+                            self.db.save_outline(doc_id, extraction.outline)
+                            self.db.index_document_terms(doc_id, self.db.build_tokenized_document(doc_id))
+                            self.question_bank.start(doc_id)
+                            self.db.update_document_pages(doc_id, extraction.page_count)
+                            self.db.save_document_hash(doc_id, sha256)
 
                             # Atualiza a interface
                             st.session_state.current_document = doc_id
-                            st.session_state.current_content = structured_content
 
                             st.success(f"Documento {uploaded_file.name} processado com sucesso!")
+                            self._show_page_timings(uploaded_file.name, extraction.page_timings)
                         else:
+                            self.db.delete_document(doc_id)
                             st.error(f"Falha ao processar {uploaded_file.name}")
 
-                        # Remove o arquivo temporário
-                        os.unlink(tmp_path)
-
                         # Atualiza a barra de progresso
                         progress_bar.progress((i + 1) / len(uploaded_files))
 
@@ -939,34 +3921,107 @@ class EstudaZillaUI:
                     cols[2].write(category or "Sem categoria")
 
                     if cols[3].button("Abrir", key=f"open_{doc_id}"):
-                        st.session_state.current_document = doc_id
-                        content = self.db.get_document_content(doc_id)
-
-                        # Converte para o formato estruturado
-                        structured = {'chapters': defaultdict(
-                            lambda: {'themes': defaultdict(lambda: {'subthemes': defaultdict(list)})})}
-
-                        for item in content:
-                            _, chapter, theme, subtheme, page, text = item
-                            structured['chapters'][chapter]['themes'][theme]['subthemes'][subtheme].append({
-                                'page': page,
-                                'text': text
-                            })
-
-                        st.session_state.current_content = structured
+                        self._open_document(doc_id)
                         st.rerun()
             else:
                 st.info("Nenhum documento carregado ainda.")
 
-        # Visualizador de conteúdo
-        if st.session_state.current_content:
-            self._show_document_content(st.session_state.current_content)
+        # Busca no conteúdo de todos os documentos
+        self._show_search()
+
+        # Visualizador de conteúdo (carregado do banco, não guardado na sessão)
+        if st.session_state.current_document:
+            self._show_document_content(st.session_state.current_document)
+
+    def _show_search(self):
+        """Mostra a busca textual sobre o conteúdo dos documentos"""
+        with st.expander("🔍 Buscar no Conteúdo", expanded=True):
+            query = st.text_input("Buscar", placeholder="Digite termos para buscar em todos os documentos")
+            if not query:
+                return
+
+            started = time.perf_counter()
+            results = self.db.search_content(query)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            if not results:
+                st.info("Nenhum trecho encontrado.")
+                return
+
+            st.caption(f"{len(results)} resultados em {elapsed:.0f} ms")
+            for result in results:
+                cols = st.columns([5, 1])
+                cols[0].markdown(
+                    f"**{result['title']}** — p. {result['page']} · {result['chapter']} / {result['theme']}\n\n"
+                    f"{result['snippet']}"
+                )
+                if cols[1].button("Abrir", key=f"search_open_{result['content_id']}"):
+                    self._open_document(result['document_id'])
+                    st.rerun()
+
+    def _open_document(self, doc_id):
+        """Define um documento salvo como documento atual"""
+        st.session_state.current_document = doc_id
+
+    def _track_progress(self, extraction, progress_bar, preview, file_index, file_count):
+        """Atualiza a barra de progresso e a prévia a cada página extraída"""
+        for block in extraction.iter_blocks():
+            fraction = block['page'] / max(1, extraction.page_count)
+            progress_bar.progress(min(1.0, (file_index + fraction) / file_count))
+            preview.info(f"Página {block['page']}: {block['text'][:300]}")
+            yield block
+
+        preview.empty()
+
+    def _show_page_timings(self, file_name, timings):
+        """Mostra o tempo de extração de cada página de um PDF processado"""
+        if not timings:
+            return
+
+        with st.expander(f"⏱️ Tempo por página - {file_name}"):
+            df = pd.DataFrame(timings)
+            ocr_pages = int((df['source'] == 'ocr').sum())
+            blank_pages = int((df['source'] == 'blank').sum())
+            st.write(
+                f"**Total:** {df['elapsed'].sum():.2f}s em {len(df)} páginas "
+                f"({ocr_pages} com OCR, {blank_pages} em branco)"
+            )
+            st.dataframe(df, hide_index=True)
 
-    def _show_document_content(self, content):
+    def _show_document_content(self, doc_id):
         """Mostra o conteúdo de um documento"""
         st.write("📄 Visualizador de Conteúdo")
 
-        chapters = list(content['chapters'].keys())
+        # Os seletores vêm do índice de seções; só a seção escolhida é lida do banco
+        outline = self.db.get_outline(doc_id)
+        sections = {}
+        for _, _, _, _, chapter, theme, subtheme in outline:
+            sections.setdefault(chapter, {}).setdefault(theme, {}).setdefault(subtheme, None)
+
+        with st.expander("🗂️ Sumário"):
+            st.markdown("\n".join(
+                f"{'  ' * max(0, level - 1)}- {title} (p. {page})"
+                for level, title, page, _, _, _, _ in outline
+            ))
+
+        with st.expander("📤 Exportar Documento"):
+            export_format = st.radio(
+                "Formato", ['PDF', 'DOCX', 'TXT', 'MD', 'HTML'], horizontal=True, key='document_export_format'
+            )
+            self._export_button(
+                f"document_{doc_id}", "Exportar Documento", "Baixar Documento", 'document', export_format.lower(),
+                lambda: self.db.iter_document_content(doc_id), "documento_estudazilla"
+            )
+
+        if st.button("🔁 Gerar flashcards do documento inteiro"):
+            with st.spinner("Gerando flashcards..."):
+                saved = self.db.generate_document_flashcards(doc_id, self.flashcard_generator)
+            if saved:
+                st.success(f"{saved} flashcards criados. Revise-os na aba Flashcards.")
+            else:
+                st.info("Todos os blocos deste documento já têm flashcards.")
+
+        chapters = list(sections.keys())
 
         if chapters:
             selected_chapter = st.selectbox(
@@ -975,8 +4030,7 @@ class EstudaZillaUI:
                 index=0
             )
 
-            chapter_data = content['chapters'][selected_chapter]
-            themes = list(chapter_data['themes'].keys())
+            themes = list(sections[selected_chapter].keys())
 
             if themes:
                 selected_theme = st.selectbox(
@@ -985,8 +4039,7 @@ class EstudaZillaUI:
                     index=0
                 )
 
-                theme_data = chapter_data['themes'][selected_theme]
-                subthemes = list(theme_data['subthemes'].keys())
+                subthemes = list(sections[selected_chapter][selected_theme].keys())
 
                 if subthemes:
                     selected_subtheme = st.selectbox(
@@ -995,7 +4048,9 @@ class EstudaZillaUI:
                         index=0
                     )
 
-                    blocks = theme_data['subthemes'][selected_subtheme]
+                    blocks = self.db.get_section_content(
+                        doc_id, selected_chapter, selected_theme, selected_subtheme
+                    )
 
                     for block in blocks:
                         st.subheader(f"Página {block['page']}")
@@ -1003,7 +4058,7 @@ class EstudaZillaUI:
                             "Conteúdo",
                             value=block['text'],
                             height=200,
-                            key=f"content_{block['page']}",
+                            key=f"content_{block['id']}",
                             label_visibility="collapsed"
                         )
 
@@ -1011,31 +4066,39 @@ class EstudaZillaUI:
                         col1, col2, col3 = st.columns([2, 2, 1])
 
                         with col1:
-                            if st.button("Gerar Resumo", key=f"summary_{block['page']}"):
+                            if st.button("Gerar Resumo", key=f"summary_{block['id']}"):
                                 st.session_state.current_block = block['text']
+                                st.session_state.current_block_id = block['id']
                                 st.session_state.show_summary = True
 
                         with col2:
-                            if st.button("Gerar Questões", key=f"quiz_{block['page']}"):
+                            if st.button("Gerar Questões", key=f"quiz_{block['id']}"):
                                 st.session_state.current_block = block['text']
+                                st.session_state.current_block_id = block['id']
                                 st.session_state.show_quiz = True
 
                         with col3:
-                            if st.button("Flashcard", key=f"flash_{block['page']}"):
-                                summary = self.summarizer.generate_summary(block['text'], style='flashcard')
-                                question, answer = summary.split("\n")[0], "\n".join(summary.split("\n")[1:])
-                                self.db.save_flashcard(st.session_state.current_document, question, answer)
-                                st.success("Flashcard criado com sucesso!")
+                            if st.button("Flashcard", key=f"flash_{block['id']}"):
+                                if block['id'] in self.db.get_flashcard_content_ids(doc_id):
+                                    st.info("Este bloco já tem flashcards. Revise-os na aba Flashcards.")
+                                else:
+                                    cards = self.flashcard_generator.for_block(
+                                        self.db.get_tokenized_content(block['id'])
+                                    )
+                                    saved = self.db.save_flashcards(
+                                        (block['id'], question, answer) for question, answer in cards
+                                    )
+                                    st.success(f"{saved} flashcard(s) criado(s) com sucesso!")
 
             # Mostra resumo se solicitado
             if hasattr(st.session_state, 'show_summary') and st.session_state.show_summary:
-                self._show_summary_options(st.session_state.current_block)
+                self._show_summary_options(st.session_state.current_block, st.session_state.current_block_id)
 
             # Mostra questões se solicitado
             if hasattr(st.session_state, 'show_quiz') and st.session_state.show_quiz:
-                self._show_quiz_options(st.session_state.current_block)
+                self._show_quiz_options(st.session_state.current_block, st.session_state.current_block_id)
 
-    def _show_summary_options(self, text):
+    def _show_summary_options(self, text, content_id):
         """Mostra opções para geração de resumo"""
         with st.expander("📝 Gerar Resumo", expanded=True):
             summary_type = st.radio(
@@ -1051,45 +4114,40 @@ class EstudaZillaUI:
                 'Mapa Mental 🧠': 'mindmap'
             }
 
-            if st.button("Gerar"):
-                summary = self.summarizer.generate_summary(text, style=style_map[summary_type])
+            style = style_map[summary_type]
+
+            # Resumos já gerados para este bloco aparecem sem recalcular
+            summary = self.memo.peek('summary', text, style=style)
+            if st.button("Gerar") and summary is None:
+                summary = self.memo.get_or_compute(
+                    'summary', text,
+                    lambda: self.summarizer.generate_summary(
+                        text, style=style, tokens=self.db.get_tokenized_content(content_id)
+                    ),
+                    style=style
+                )
 
+            if summary is not None:
                 st.subheader("Resumo Gerado")
                 st.text_area("Resumo", value=summary, height=300)
 
                 # Opções de exportação
                 export_format = st.radio(
                     "Exportar como",
-                    ['TXT', 'PDF', 'DOCX'],
+                    ['TXT', 'PDF', 'DOCX', 'MD', 'HTML'],
                     horizontal=True
                 )
 
-                if st.button("Exportar"):
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{export_format.lower()}') as tmp_file:
-                        filename = tmp_file.name
-
-                    if export_format == 'TXT':
-                        self.exporter.export_txt(summary, filename)
-                    elif export_format == 'PDF':
-                        self.exporter.export_pdf(summary, filename)
-                    elif export_format == 'DOCX':
-                        self.exporter.export_docx(summary, filename)
-
-                    with open(filename, 'rb') as f:
-                        st.download_button(
-                            "Baixar Arquivo",
-                            f.read(),
-                            file_name=f"resumo_estudazilla.{export_format.lower()}",
-                            mime=f"application/{export_format.lower()}"
-                        )
-
-                    os.unlink(filename)
+                self._export_button(
+                    "summary", "Exportar", "Baixar Arquivo", 'summary', export_format.lower(),
+                    lambda: summary, "resumo_estudazilla"
+                )
 
             if st.button("Fechar"):
                 del st.session_state.show_summary
                 st.rerun()
 
-    def _show_quiz_options(self, text):
+    def _show_quiz_options(self, text, content_id):
         """Mostra opções para geração de quiz"""
         with st.expander("🧪 Gerar Questões", expanded=True):
             question_type = st.radio(
@@ -1108,10 +4166,14 @@ class EstudaZillaUI:
             }
 
             if st.button("Gerar"):
-                questions = self.quiz_generator.generate_quiz(
-                    text,
-                    num_questions=num_questions,
-                    q_type=type_map[question_type]
+                q_type = type_map[question_type]
+                questions = self.memo.get_or_compute(
+                    'quiz', text,
+                    lambda: self.quiz_generator.generate_quiz(
+                        self.db.get_tokenized_content(content_id), num_questions=num_questions, q_type=q_type
+                    ),
+                    q_type=q_type,
+                    num_questions=num_questions
                 )
 
                 st.session_state.generated_questions = questions
@@ -1145,43 +4207,88 @@ class EstudaZillaUI:
                         st.write(f"**Explicação:** {question['explanation']}")
 
                 if st.button(f"Salvar Questão {i}"):
-                    self.db.save_question(st.session_state.current_document, question)
+                    self.db.save_question(question.get('content_id'), question)
                     st.success("Questão salva com sucesso!")
 
         # Opções de exportação
         st.subheader("Exportar Simulado")
         export_format = st.radio(
             "Formato",
-            ['PDF', 'DOCX', 'TXT'],
+            ['PDF', 'DOCX', 'TXT', 'MD', 'HTML'],
             horizontal=True,
             key='quiz_export_format'
         )
 
-        if st.button("Exportar Todas as Questões"):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{export_format.lower()}') as tmp_file:
-                filename = tmp_file.name
-
-            self.exporter.export_quiz(questions, filename, format=export_format.lower())
-
-            with open(filename, 'rb') as f:
-                st.download_button(
-                    "Baixar Simulado",
-                    f.read(),
-                    file_name=f"simulado_estudazilla.{export_format.lower()}",
-                    mime=f"application/{export_format.lower()}"
-                )
-
-            os.unlink(filename)
+        self._export_button(
+            "quiz", "Exportar Todas as Questões", "Baixar Simulado", 'quiz', export_format.lower(),
+            lambda: questions, "simulado_estudazilla"
+        )
 
     def show_summaries_tab(self):
         """Mostra a aba de resumos"""
         st.title("📄 Resumos")
-        st.info("Esta funcionalidade está em desenvolvimento. Use a aba de Documentos para gerar resumos.")
+
+        documents = self.db.get_documents()
+        if not documents:
+            st.info("Nenhum documento carregado. Envie um PDF na aba de Documentos.")
+            return
+
+        titles = {doc[0]: doc[1] for doc in documents}
+        doc_ids = list(titles)
+        current = st.session_state.current_document
+        doc_id = st.selectbox(
+            "Documento",
+            doc_ids,
+            index=doc_ids.index(current) if current in doc_ids else 0,
+            format_func=titles.get
+        )
+
+        style_map = {
+            'Bullet Points ✅': 'bullet',
+            'Flashcards 🔁': 'flashcard',
+            'Dissertativo 📝': 'dissertative',
+            'Mapa Mental 🧠': 'mindmap'
+        }
+        keywords = self.db.get_document_keywords(doc_id)
+        if keywords:
+            st.caption("Palavras-chave: " + ", ".join(keywords))
+
+        summary_type = st.radio("Tipo de Resumo", list(style_map), horizontal=True)
+        summaries = self.db.get_summaries(doc_id, style_map[summary_type])
+
+        label = "🔄 Resumir novamente" if summaries else "📚 Resumir documento inteiro"
+        if st.button(label):
+            pipeline = DocumentSummaryPipeline(workers=st.session_state.get('ingestion_workers'))
+            progress_bar = st.progress(0)
+            status = st.empty()
+            for done, total in pipeline.run(self.db, doc_id):
+                progress_bar.progress(done / total)
+                status.text(f"Capítulos resumidos: {done} de {total}")
+            st.rerun()
+
+        if not summaries:
+            st.info("Este documento ainda não foi resumido.")
+            return
+
+        headers = {2: "####", 3: "#####"}
+        chapter = None
+        expander = None
+        for entry in summaries:
+            if entry['level'] == 1:
+                chapter = entry['chapter']
+                expander = st.expander(f"📖 {chapter}", expanded=False)
+                expander.text(entry['summary'])
+            elif entry['chapter'] == chapter:
+                title = entry['theme'] if entry['level'] == 2 else entry['subtheme']
+                expander.markdown(f"{headers[entry['level']]} {title}")
+                expander.text(entry['summary'])
 
     def show_quizzes_tab(self):
         """Mostra a aba de simulados"""
         st.title("🎓 Simulados")
 
+        self._show_question_bank_jobs()
+
         # Banco de questões
         with st.expander("📚 Banco de Questões"):
             question_types = ['Todas', 'Múltipla Escolha', 'Verdadeiro/Falso', 'Resposta Curta', 'Estudo de Caso']
@@ -1195,9 +4302,37 @@ class EstudaZillaUI:
                 'Estudo de Caso': 'case_study'
             }
 
-            questions = self.db.get_questions(type_map[selected_type])
+            filters = {'question_type': type_map[selected_type]}
+            total = self._question_bank_query('count', filters)
+
+            if total:
+                page_size = st.selectbox("Questões por página", [10, 20, 50], index=1)
+                pages = (total + page_size - 1) // page_size
+
+                # Paginação por chave: a pilha guarda o último id de cada página já vista
+                cursor_key = (selected_type, page_size)
+                if st.session_state.get('bank_cursor_key') != cursor_key:
+                    st.session_state.bank_cursor_key = cursor_key
+                    st.session_state.bank_cursor = [0]
+                cursor = st.session_state.bank_cursor
+
+                questions = self.db.get_questions_page(page_size, after_id=cursor[-1], **filters)
+                page = len(cursor)
+                first = (page - 1) * page_size
+                st.caption(
+                    f"Página {page} de {pages} — questões {first + 1}–{first + len(questions)} de {total}"
+                )
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("⬅️ Anterior", disabled=page == 1, key="bank_previous"):
+                        cursor.pop()
+                        st.rerun()
+                with col2:
+                    if st.button("Próxima ➡️", disabled=page >= pages or not questions, key="bank_next"):
+                        cursor.append(questions[-1]['id'])
+                        st.rerun()
 
-            if questions:
                 for question in questions:
                     with st.expander(f"Questão {question['id']}"):
                         st.write(f"**{question['question']}**")
@@ -1219,112 +4354,266 @@ class EstudaZillaUI:
 
         # Criar simulado personalizado
         with st.expander("✏️ Criar Simulado Personalizado"):
-            st.warning("Esta funcionalidade está em desenvolvimento.")
+            self._show_mock_exam_builder(type_map)
 
-    def show_flashcards_tab(self):
-        """Mostra a aba de flashcards"""
-        st.title("🔁 Flashcards")
+        if st.session_state.get('mock_exam'):
+            self._show_mock_exam(st.session_state.mock_exam)
 
-        # Obter flashcards do banco de dados
-        flashcards = self.db.get_flashcards()
-        st.session_state.flashcards = flashcards
+    def _show_mock_exam_builder(self, type_map):
+        """Opções do simulado: filtros, estratificação e número de questões"""
+        documents = self.db.get_documents()
+        titles = {None: "Todos os documentos", **{doc[0]: doc[1] for doc in documents}}
+        doc_id = st.selectbox("Documento", list(titles), format_func=titles.get, key="exam_document")
 
-        if flashcards:
-            # Controles de navegação
-            if 'current_flashcard' not in st.session_state:
-                st.session_state.current_flashcard = 0
-                st.session_state.show_answer = False
+        chapters = self._question_bank_query('chapter', {'document_id': doc_id})
+        selected_chapters = st.multiselect("Capítulos", chapters, key="exam_chapters")
+        selected_types = st.multiselect(
+            "Tipos de questão", [label for label in type_map if type_map[label]], key="exam_types"
+        )
+        difficulties = self._question_bank_query('difficulty', {'document_id': doc_id})
+        difficulty = st.multiselect("Dificuldade", difficulties, key="exam_difficulty")
+
+        strata_labels = {
+            'Capítulo': 'chapter',
+            'Tema': 'theme',
+            'Tipo': 'question_type',
+            'Dificuldade': 'difficulty'
+        }
+        by = st.multiselect(
+            "Distribuir as questões por", list(strata_labels), default=['Capítulo', 'Tipo'], key="exam_strata"
+        )
+        proportional = st.radio(
+            "Cotas", ["Proporcionais ao banco", "Iguais por grupo"], horizontal=True, key="exam_quotas"
+        ) == "Proporcionais ao banco"
+        count = st.slider("Número de questões", 5, 100, 20, key="exam_count")
+
+        filters = {
+            'document_id': doc_id,
+            'chapter': selected_chapters,
+            'question_type': [type_map[label] for label in selected_types],
+            'difficulty': difficulty
+        }
+        available = self._question_bank_query('count', filters)
+        st.caption(f"{available} questões disponíveis com esses filtros")
 
-            total = len(flashcards)
-            current = st.session_state.current_flashcard + 1
+        if st.button("Montar Simulado", disabled=not available):
+            st.session_state.mock_exam = self.db.sample_questions(
+                count, by=[strata_labels[label] for label in by], proportional=proportional, **filters
+            )
+            st.session_state.mock_exam_graded = False
+            st.rerun()
+
+    def _question_bank_query(self, query, filters):
+        """Contagem ('count') ou valores de uma coluna do banco de questões, guardados na sessão.
+
+        Os reruns só repetem o GROUP BY quando os filtros mudam ou quando o
+        banco muda (question_bank_version, consultas pela chave primária).
+        """
+        version = self.db.question_bank_version()
+        if st.session_state.get('bank_queries_version') != version:
+            st.session_state.bank_queries_version = version
+            st.session_state.bank_queries = {}
+        results = st.session_state.bank_queries
+
+        key = (query, json.dumps(filters, sort_keys=True, default=list))
+        if key not in results:
+            if query == 'count':
+                results[key] = self.db.count_questions(**filters)
+            else:
+                results[key] = [values[0] for values, _ in self.db.question_strata((query,), **filters)]
+        return results[key]
 
-            col1, col2, col3 = st.columns([1, 2, 1])
-            with col1:
-                if st.button("⏮️ Anterior") and st.session_state.current_flashcard > 0:
-                    st.session_state.current_flashcard -= 1
-                    st.session_state.show_answer = False
-                    st.rerun()
+    def _show_mock_exam(self, questions):
+        """Mostra o simulado montado e corrige as questões objetivas"""
+        st.subheader(f"📝 Simulado ({len(questions)} questões)")
+        graded = st.session_state.get('mock_exam_graded', False)
+        correct = 0
+        objective = 0
 
-            with col2:
-                st.write(f"Flashcard {current} de {total}")
-                st.write(
-                    f"**Tópico:** {flashcards[st.session_state.current_flashcard][3]} - {flashcards[st.session_state.current_flashcard][4]}")
-
-            with col3:
-                if st.button("⏭️ Próximo") and st.session_state.current_flashcard < total - 1:
-                    st.session_state.current_flashcard += 1
-                    st.session_state.show_answer = False
-                    st.rerun()
+        for i, question in enumerate(questions, 1):
+            with st.container(border=True):
+                st.write(f"**{i}. {question['question']}**")
+                st.caption(f"{question['chapter']} — {question['theme']}")
+                key = f"exam_answer_{question['id']}"
+
+                if question['type'] in ('multiple_choice', 'true_false'):
+                    objective += 1
+                    options = question['options'] if question['type'] == 'multiple_choice' else ['True', 'False']
+                    labels = {'True': "Verdadeiro", 'False': "Falso"}
+                    answer = st.radio(
+                        "Resposta", options, index=None, key=key,
+                        format_func=lambda option: labels.get(option, option)
+                    )
+                    if graded:
+                        if answer == question['answer']:
+                            correct += 1
+                            st.success("Correta")
+                        else:
+                            st.error(f"Resposta correta: {labels.get(question['answer'], question['answer'])}")
+                else:
+                    st.text_area("Resposta", key=key)
+                    if graded:
+                        st.info(f"Resposta esperada: {question['answer']}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Corrigir Simulado"):
+                st.session_state.mock_exam_graded = True
+                st.rerun()
+        with col2:
+            if st.button("Descartar Simulado"):
+                del st.session_state.mock_exam
+                st.rerun()
+
+        if graded and objective:
+            st.metric("Acertos nas questões objetivas", f"{correct}/{objective}")
+
+    def _show_question_bank_jobs(self):
+        """Progresso da geração do banco de questões de cada documento"""
+        documents = self.db.get_documents()
+        if not documents:
+            return
+
+        with st.expander("⚙️ Geração do Banco de Questões", expanded=False):
+            status_labels = {
+                'running': "em andamento",
+                'interrupted': "interrompida",
+                'failed': "falhou",
+                'done': "concluída"
+            }
+
+            for doc_id, title, *_ in documents:
+                job = self.question_bank.progress(doc_id)
+                col1, col2 = st.columns([4, 1])
+
+                with col1:
+                    if job is None:
+                        st.write(f"**{title}**: não gerado")
+                    else:
+                        total = max(job['blocks_total'], 1)
+                        st.progress(
+                            min(job['blocks_done'] / total, 1.0),
+                            text=f"{title}: {status_labels[job['status']]} — "
+                                 f"{job['blocks_done']}/{job['blocks_total']} blocos, {job['questions']} questões"
+                        )
+                        if job['error']:
+                            st.caption(f"Erro: {job['error']}")
+
+                with col2:
+                    if job is None or job['status'] in ('interrupted', 'failed'):
+                        label = "Gerar" if job is None else "Retomar"
+                        if st.button(label, key=f"question_job_{doc_id}"):
+                            self.question_bank.start(doc_id)
+                            st.rerun()
+
+            if st.button("🔄 Atualizar progresso"):
+                st.rerun()
+
+    def show_flashcards_tab(self):
+        """Mostra a aba de flashcards"""
+        st.title("🔁 Flashcards")
+
+        # Fila de revisão: apenas os próximos cartões vencidos saem do banco
+        if not st.session_state.get('flashcard_queue'):
+            st.session_state.flashcard_queue = self.db.get_due_flashcards(limit=20)
+            st.session_state.show_answer = False
+        queue = st.session_state.flashcard_queue
+
+        if queue:
+            card = queue[0]
+            st.write(f"Cartões para revisar agora: {self.db.count_due_flashcards()}")
+            st.write(f"**Tópico:** {card['chapter'] or 'Sem Capítulo'} - {card['theme'] or 'Sem Tema'}")
 
             # Mostra o flashcard atual
-            card = st.container(border=True)
-            card.write(f"**Pergunta:** {flashcards[st.session_state.current_flashcard][1]}")
+            container = st.container(border=True)
+            container.write(f"**Pergunta:** {card['question']}")
 
             if st.session_state.show_answer:
-                card.write(f"**Resposta:** {flashcards[st.session_state.current_flashcard][2]}")
+                container.write(f"**Resposta:** {card['answer']}")
 
-                # Avaliação da dificuldade
-                col1, col2, col3 = st.columns(3)
+                # Avaliação da resposta (nota do SM-2)
+                col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    if st.button("Fácil 😊"):
-                        self._update_flashcard_difficulty(flashcards[st.session_state.current_flashcard][0], 1)
+                    if st.button("Errei 😵"):
+                        self._review_flashcard(card['id'], 1)
                 with col2:
-                    if st.button("Médio 😐"):
-                        self._update_flashcard_difficulty(flashcards[st.session_state.current_flashcard][0], 2)
-                with col3:
                     if st.button("Difícil 😓"):
-                        self._update_flashcard_difficulty(flashcards[st.session_state.current_flashcard][0], 3)
+                        self._review_flashcard(card['id'], 3)
+                with col3:
+                    if st.button("Bom 😐"):
+                        self._review_flashcard(card['id'], 4)
+                with col4:
+                    if st.button("Fácil 😊"):
+                        self._review_flashcard(card['id'], 5)
             else:
                 if st.button("Mostrar Resposta"):
                     st.session_state.show_answer = True
                     st.rerun()
+        else:
+            next_due = self.db.next_flashcard_due()
+            if next_due:
+                st.success(f"Nenhum flashcard para revisar agora. Próxima revisão: {next_due} (UTC)")
+            else:
+                st.info("Nenhum flashcard encontrado. Crie flashcards na aba de Documentos.")
 
+        if self.db.next_flashcard_due():
             # Exportar flashcards
             with st.expander("📤 Exportar Flashcards"):
                 export_format = st.radio(
                     "Formato",
-                    ['PDF', 'DOCX', 'TXT'],
+                    ['PDF', 'DOCX', 'TXT', 'MD', 'HTML'],
                     horizontal=True
                 )
 
-                if st.button("Exportar Todos"):
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{export_format.lower()}') as tmp_file:
-                        filename = tmp_file.name
-
-                    # Cria conteúdo para exportação
-                    content = []
-                    for card in flashcards:
-                        content.append(f"Pergunta: {card[1]}\nResposta: {card[2]}\n\n")
-
-                    if export_format == 'PDF':
-                        self.exporter.export_pdf("".join(content), filename)
-                    elif export_format == 'DOCX':
-                        self.exporter.export_docx("".join(content), filename)
-                    elif export_format == 'TXT':
-                        self.exporter.export_txt("".join(content), filename)
-
-                    with open(filename, 'rb') as f:
-                        st.download_button(
-                            "Baixar Flashcards",
-                            f.read(),
-                            file_name=f"flashcards_estudazilla.{export_format.lower()}",
-                            mime=f"application/{export_format.lower()}"
-                        )
+                self._export_button(
+                    "flashcards", "Exportar Todos", "Baixar Flashcards", 'flashcards', export_format.lower(),
+                    self.db.iter_flashcards, "flashcards_estudazilla"
+                )
 
-                    os.unlink(filename)
+    def _export_button(self, slot, label, download_label, kind, export_format, source, file_stem):
+        """Exportação em segundo plano: gera (ou reaproveita do cache) e mostra o download quando pronto.
+
+        O hash do conteúdo só é calculado no clique; a chave do arquivo fica
+        na sessão para que os reruns seguintes consultem o status.
+        """
+        jobs = st.session_state.setdefault('export_jobs', {})
+        slot = f"{slot}_{export_format}"
+
+        if st.button(label, key=f"export_{slot}"):
+            digest = self.exports.content_digest(source())
+            jobs[slot] = self.exports.submit(kind, export_format, digest, source)
+            # Exportações pequenas terminam aqui mesmo, sem precisar de um rerun
+            self.exports.wait(jobs[slot], timeout=2)
+
+        key = jobs.get(slot)
+        if key is None:
+            return
+
+        status = self.exports.status(key)
+        data = self.exports.result(key) if status == 'done' else None
+        if data is not None:
+            st.download_button(
+                download_label,
+                data,
+                file_name=f"{file_stem}.{export_format}",
+                mime=EXPORT_FORMATS[export_format],
+                key=f"download_{slot}"
+            )
+        elif status == 'running':
+            st.info("Gerando o arquivo em segundo plano...")
+            if st.button("🔄 Verificar", key=f"export_poll_{slot}"):
+                st.rerun()
+        elif status == 'failed':
+            st.error(f"Falha na exportação: {self.exports.error(key)}")
         else:
-            st.info("Nenhum flashcard encontrado. Crie flashcards na aba de Documentos.")
-
-    def _update_flashcard_difficulty(self, flashcard_id, difficulty):
-        """Atualiza a dificuldade de um flashcard"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-        UPDATE flashcards 
-        SET difficulty = ?, last_reviewed = datetime('now')
-        WHERE id = ?
-        ''', (difficulty, flashcard_id))
-        self.db.conn.commit()
-        st.success("Obrigado pelo feedback! Flashcard atualizado.")
+            del jobs[slot]
+
+    def _review_flashcard(self, flashcard_id, grade):
+        """Registra a resposta no agendador e passa para o próximo cartão da fila"""
+        due_date = self.db.review_flashcard(flashcard_id, grade)
+        st.session_state.flashcard_queue.pop(0)
+        st.session_state.show_answer = False
+        st.toast(f"Próxima revisão deste cartão: {due_date} (UTC)")
         st.rerun()
 
     def show_settings_tab(self):
@@ -1342,6 +4631,30 @@ class EstudaZillaUI:
                 else:
                     st.error("Caminho do Tesseract inválido. Usando padrão do sistema.")
 
+            st.session_state.ocr_dpi = st.select_slider(
+                "Resolução máxima do OCR (DPI)",
+                options=[150, 200, 300, 400],
+                value=self.processor.preprocessor.target_dpi
+            )
+
+            st.write("**Recursos de NLP**")
+            missing = nlp.missing_resources()
+            if missing:
+                st.warning(f"Recursos do NLTK ausentes: {', '.join(missing)}. Usando tokenização simplificada.")
+                if st.button("Baixar recursos do NLTK"):
+                    nlp.download_missing()
+                    st.rerun()
+            else:
+                st.success("Recursos do NLTK instalados.")
+
+            st.write("**Processamento de PDFs**")
+            st.session_state.ingestion_workers = st.number_input(
+                "Processos paralelos",
+                min_value=1,
+                max_value=max(1, os.cpu_count() or 1),
+                value=self.processor.workers
+            )
+
         with st.expander("🗄️ Gerenciamento de Dados"):
             st.write("**Backup e Restauração**")
 
@@ -1351,11 +4664,8 @@ class EstudaZillaUI:
                     with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
                         filename = tmp_file.name
 
-                    # Cria uma cópia do banco de dados
-                    self.db.conn.close()
-                    import shutil
-                    shutil.copy2('estudazilla.db', filename)
-                    self.db = DatabaseManager()
+                    # Cria uma cópia consistente do banco sem fechar as conexões em uso
+                    self.db.backup_to(filename)
 
                     with open(filename, 'rb') as f:
                         st.download_button(
@@ -1371,30 +4681,29 @@ class EstudaZillaUI:
                 uploaded_db = st.file_uploader("Restaurar Backup", type=['db'])
                 if uploaded_db and st.button("Restaurar"):
                     try:
-                        self.db.conn.close()
-                        with open('estudazilla.db', 'wb') as f:
-                            f.write(uploaded_db.getvalue())
+                        with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
+                            tmp_file.write(uploaded_db.getvalue())
+                            backup_path = tmp_file.name
+
+                        try:
+                            self.db.restore_from(backup_path)
+                        finally:
+                            os.unlink(backup_path)
 
-                        self.db = DatabaseManager()
                         st.success("Banco de dados restaurado com sucesso!")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Erro ao restaurar backup: {str(e)}")
-                        self.db = DatabaseManager()
 
             if st.button("🔄 Redefinir Banco de Dados", type="primary"):
                 if st.checkbox("Confirmar exclusão de TODOS os dados"):
                     try:
-                        self.db.conn.close()
-                        os.remove('estudazilla.db')
-                        self.db = DatabaseManager()
+                        self.db.reset()
                         st.session_state.current_document = None
-                        st.session_state.current_content = None
                         st.success("Banco de dados redefinido com sucesso!")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Erro ao redefinir banco de dados: {str(e)}")
-                        self.db = DatabaseManager()
 
 
 # Função principal
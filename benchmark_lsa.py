@@ -0,0 +1,176 @@
+"""Compara o LSASummarizer do EstudaZilla com o LsaSummarizer do sumy.
+
+Para cada tamanho de capítulo mede tempo, pico de memória (tracemalloc), a
+cobertura do resumo (cosseno entre as palavras do resumo e as do capítulo), a
+sobreposição entre as frases escolhidas pelos dois métodos e o ROUGE-1 (F1)
+do resumo contra o do sumy. Mede também o modo em lote (summarize_many)
+contra chamadas individuais do sumy.
+
+Cada texto é resumido por dois motores: o padrão (TF-IDF e 5 componentes,
+que escolhe frases diferentes das do sumy por construção) e o de paridade
+(weighting='sumy' e todos os componentes, com as mesmas palavras vazias), que
+deve reproduzir a escolha do sumy.
+
+Uso:
+    python benchmark_lsa.py
+    python benchmark_lsa.py --sizes 200 1000 4000 --summary 5
+    python benchmark_lsa.py --text capitulo.txt outro_capitulo.txt
+"""
+
+import argparse
+import math
+import random
+import time
+import tracemalloc
+from collections import Counter
+
+from sumy.models.dom import ObjectDocumentModel, Paragraph, Sentence
+from sumy.summarizers.lsa import LsaSummarizer
+
+from TESTE2 import LSASummarizer, TokenizedDocument, nlp
+
+TOPICS = [
+    'energia solar painel eletricidade consumo rede bateria',
+    'economia inflação juros mercado crédito moeda banco',
+    'célula membrana proteína enzima núcleo genética organismo',
+    'revolução império guerra tratado território colônia século',
+    'equação função derivada integral limite matriz vetor',
+    'clima temperatura chuva oceano atmosfera carbono floresta',
+]
+FILLER = 'o a de que em um para com não uma os no se na por mais as dos como'.split()
+
+
+def synthetic_text(sentences, seed=0, vocabulary=400):
+    """Texto artificial com tópicos misturados e vocabulário de cauda longa"""
+    rng = random.Random(seed)
+    syllables = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'zo']
+    topics = []
+    for topic in TOPICS:
+        words = topic.split()
+        words += [
+            words[i % len(words)][:4] + ''.join(rng.choice(syllables) for _ in range(2))
+            for i in range(vocabulary)
+        ]
+        topics.append(words)
+
+    lines = []
+    for _ in range(sentences):
+        words = rng.choice(topics)
+        length = rng.randint(8, 24)
+        sentence = [
+            # Distribuição aproximadamente de Zipf dentro de cada tópico
+            words[min(int(rng.paretovariate(1.0)) - 1, len(words) - 1)] if rng.random() < 0.5 else rng.choice(FILLER)
+            for _ in range(length)
+        ]
+        lines.append(' '.join(sentence).capitalize() + '.')
+    return ' '.join(lines)
+
+
+def measure(function):
+    """Executa a função medindo tempo (s) e pico de memória (MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def sumy_summary(tokens, count):
+    summarizer = LsaSummarizer()
+    summarizer.stop_words = nlp.stop_words
+    document = ObjectDocumentModel([
+        Paragraph([Sentence(sentence, nlp.tokenizer) for sentence in tokens.sentences])
+    ])
+    return [str(sentence) for sentence in summarizer(document, count)]
+
+
+def overlap(first, second):
+    return len(set(first) & set(second)) / max(len(first), 1)
+
+
+def rouge1(reference, candidate):
+    """ROUGE-1 (F1 dos unigramas) do resumo `candidate` contra `reference`"""
+    def unigrams(sentences):
+        return Counter(word for sentence in sentences for word in nlp.word_tokenize(sentence.lower()))
+
+    reference, candidate = unigrams(reference), unigrams(candidate)
+    hits = sum((reference & candidate).values())
+    if not hits:
+        return 0.0
+    precision = hits / sum(candidate.values())
+    recall = hits / sum(reference.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def coverage(summary, tokens):
+    """Similaridade de cosseno entre as palavras do resumo e as do documento"""
+    def counts(words):
+        return Counter(word for word in words if word not in nlp.stop_words)
+
+    document = counts(tokens.tokens)
+    selected = counts(word for sentence in summary for word in nlp.word_tokenize(sentence.lower()))
+    dot = sum(count * document[word] for word, count in selected.items())
+    norm = math.sqrt(sum(c * c for c in document.values())) * math.sqrt(sum(c * c for c in selected.values()))
+    return dot / norm if norm else 0.0
+
+
+def compare(tokens, count, engines):
+    """Uma linha por motor: (nome, tempo, memória, cobertura, sobreposição, ROUGE-1)"""
+    expected, sumy_time, sumy_memory = measure(lambda: sumy_summary(tokens, count))
+    rows = [('sumy', sumy_time, sumy_memory, coverage(expected, tokens), 1.0, 1.0)]
+    for name, engine in engines.items():
+        result, time_, memory = measure(lambda: engine(tokens, count))
+        rows.append((
+            name, time_, memory, coverage(result, tokens),
+            overlap(expected, result), rouge1(expected, result)
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--summary', type=int, default=5, help='frases por resumo')
+    parser.add_argument('--blocks', type=int, default=200, help='blocos no teste em lote')
+    parser.add_argument('--text', nargs='+', help='arquivos de texto a usar no lugar do texto artificial')
+    args = parser.parse_args()
+
+    engine = LSASummarizer(nlp.stop_words)
+    engines = {
+        'padrão': engine,
+        'paridade': LSASummarizer(nlp.stop_words, components=None, weighting='sumy'),
+    }
+
+    print(
+        f"{'frases':>8} {'motor':>9} {'s':>8} {'MB':>8} {'cob.':>6} {'sobrep.':>8} {'ROUGE-1':>8}"
+    )
+    if args.text:
+        documents = []
+        for path in args.text:
+            with open(path, encoding='utf-8') as f:
+                documents.append(TokenizedDocument.from_text(f.read()))
+    else:
+        documents = [TokenizedDocument.from_text(synthetic_text(size)) for size in args.sizes]
+
+    for tokens in documents:
+        for name, time_, memory, cover, agreement, rouge in compare(tokens, args.summary, engines):
+            print(
+                f"{len(tokens):>8} {name:>9} {time_:>8.3f} {memory:>8.1f} {cover:>6.2f} "
+                f"{agreement:>8.0%} {rouge:>8.2f}"
+            )
+
+    print(
+        "\nO motor padrão (TF-IDF, 5 componentes) ranqueia as frases de outro modo e não busca a "
+        "mesma escolha do sumy; a paridade com o sumy é medida pelo motor 'paridade'."
+    )
+
+    blocks = [TokenizedDocument.from_text(synthetic_text(30, seed)) for seed in range(args.blocks)]
+    _, sumy_time, _ = measure(lambda: [sumy_summary(block, args.summary) for block in blocks])
+    _, batch_time, _ = measure(lambda: engine.summarize_many(blocks, args.summary))
+    print(f"\nLote de {len(blocks)} blocos: sumy {sumy_time:.3f}s, summarize_many {batch_time:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
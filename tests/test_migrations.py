@@ -0,0 +1,25 @@
+import multiprocessing
+
+import TESTE2
+
+
+def _open_database(path, barrier):
+    barrier.wait()
+    TESTE2.DatabaseManager(path)
+
+
+def test_concurrent_processes_migrate_once(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(6)
+
+    processes = [context.Process(target=_open_database, args=(path, barrier)) for _ in range(6)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 6
+    db = TESTE2.DatabaseManager(path)
+    versions = [row[0] for row in db.conn.execute('SELECT version FROM schema_migrations ORDER BY version')]
+    assert versions == [version for version, _, _ in TESTE2.SCHEMA_MIGRATIONS]
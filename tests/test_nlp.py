@@ -0,0 +1,27 @@
+import nltk
+
+import TESTE2
+
+
+def test_old_punkt_pickle_is_not_enough(tmp_path, monkeypatch):
+    pickle = tmp_path / "tokenizers" / "punkt" / "portuguese.pickle"
+    pickle.parent.mkdir(parents=True)
+    pickle.write_bytes(b"")
+    monkeypatch.setattr(nltk.data, 'path', [str(tmp_path)])
+
+    resources = TESTE2.NLPResources()
+    assert 'punkt' in resources.missing_resources()
+    assert resources.sent_tokenize("Primeira frase. Segunda frase.") == ["Primeira frase.", "Segunda frase."]
+
+
+def test_tokenizers_fall_back_when_nltk_cannot_load_punkt(monkeypatch):
+    def missing(*args, **kwargs):
+        raise LookupError("punkt_tab")
+
+    monkeypatch.setattr(TESTE2, 'sent_tokenize', missing)
+    monkeypatch.setattr(TESTE2, 'word_tokenize', missing)
+    resources = TESTE2.NLPResources()
+    monkeypatch.setattr(resources, 'has_resource', lambda name: True)
+
+    assert resources.word_tokenize("Olá, mundo") == ["Olá", "mundo"]
+    assert resources.sent_tokenize("Olá. Tudo bem?") == ["Olá.", "Tudo bem?"]
@@ -0,0 +1,100 @@
+from io import BytesIO
+
+import fitz
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+import TESTE2
+
+
+def test_tesserocr_backend_recognizes_page():
+    tesserocr = pytest.importorskip("tesserocr")
+    _, languages = tesserocr.get_languages()
+    lang = TESTE2.OCR_LANG if TESTE2.OCR_LANG in languages else languages[0]
+
+    image = BytesIO()
+    Image.new('L', (200, 60), 255).save(image, format='PNG')
+
+    backend = TESTE2.TesserocrBackend(lang=lang)
+    assert isinstance(backend.recognize(image.getvalue()), str)
+
+
+def _scanned_page(lines, font_pt, dpi=200, background=238):
+    """Página A4 digitalizada (só imagem, fundo acinzentado com ruído) com algumas linhas de texto"""
+    image = Image.new('L', (int(8.27 * dpi), int(11.69 * dpi)), background)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=int(font_pt * dpi / 72))
+    for i in range(lines):
+        y = dpi + i * int(font_pt * dpi / 72 * 1.5)
+        draw.text((dpi, y), "Lorem ipsum dolor sit amet, consectetur adipiscing elit", fill=40, font=font)
+
+    noise = np.random.default_rng(0).normal(0, 6, (image.height, image.width))
+    pixels = np.clip(np.asarray(image) + noise, 0, 255).astype(np.uint8)
+    png = BytesIO()
+    Image.fromarray(pixels).save(png, format='PNG')
+
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=png.getvalue())
+    return doc
+
+
+@pytest.mark.parametrize("lines, font_pt", [(1, 10), (2, 10), (3, 10), (5, 6)])
+def test_sparse_scanned_page_is_not_blank(lines, font_pt):
+    doc = _scanned_page(lines, font_pt)
+    assert TESTE2.OCRPreprocessor().prepare_page(doc[0]) is not None
+
+
+def test_empty_scanned_page_is_blank():
+    doc = _scanned_page(0, 10)
+    assert TESTE2.OCRPreprocessor().prepare_page(doc[0]) is None
+
+
+def _png(shade):
+    image = BytesIO()
+    Image.new('L', (8, 8), shade).save(image, format='PNG')
+    return image.getvalue()
+
+
+class _EchoBackend(TESTE2.FakeOCRBackend):
+    """Devolve um texto por imagem, para conferir a ordem dos resultados"""
+
+    def recognize(self, image_bytes):
+        super().recognize(image_bytes)
+        return str(Image.open(BytesIO(image_bytes)).getpixel((0, 0)))
+
+
+def test_recognize_many_keeps_input_order(tmp_path):
+    service = TESTE2.OCRService(backend=_EchoBackend(), workers=4, cache_dir=str(tmp_path))
+    try:
+        shades = list(range(0, 250, 10))
+        assert service.recognize_many([_png(shade) for shade in shades]) == [str(shade) for shade in shades]
+    finally:
+        service.shutdown()
+
+
+def test_repeated_image_comes_from_disk_cache(tmp_path):
+    backend = TESTE2.FakeOCRBackend()
+    service = TESTE2.OCRService(backend=backend, cache_dir=str(tmp_path))
+    try:
+        first = service.submit(_png(0)).result()
+        second = service.submit(_png(0)).result()
+    finally:
+        service.shutdown()
+
+    assert first == {'text': backend.text, 'elapsed': first['elapsed'], 'cached': False}
+    assert second['cached'] and second['text'] == backend.text
+    assert backend.calls == 1
+
+
+def test_cache_key_depends_on_config_and_lang(tmp_path):
+    image = _png(0)
+    keys = set()
+    for config, lang in [('--psm 6', 'por'), ('--psm 3', 'por'), ('--psm 6', 'eng')]:
+        service = TESTE2.OCRService(
+            backend=TESTE2.FakeOCRBackend(config=config, lang=lang), workers=1, cache_dir=str(tmp_path)
+        )
+        keys.add(service.cache_key(image))
+        service.shutdown()
+    assert len(keys) == 3
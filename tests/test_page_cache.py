@@ -0,0 +1,27 @@
+import fitz
+
+import TESTE2
+
+
+def _pdf(path):
+    doc = fitz.open()
+    page = doc.new_page()
+    y = 72
+    for text, size in [("CAPÍTULO 1: Intro", 18), ("Corpo.", 11), ("Tema 2: citado no corpo do texto", 11)]:
+        page.insert_text((72, y), text, fontsize=size)
+        y += 30
+    doc.save(path)
+
+
+def test_cached_pages_keep_the_heading_font_filter(tmp_path):
+    path = str(tmp_path / "doc.pdf")
+    _pdf(path)
+    db = TESTE2.DatabaseManager(str(tmp_path / "db.sqlite"))
+
+    outlines = []
+    for _ in range(2):
+        extraction = TESTE2.PDFProcessor(workers=1).extract(path, page_cache=db)
+        list(extraction.iter_blocks())
+        outlines.append([(item['level'], item['title']) for item in extraction.outline])
+
+    assert outlines[0] == outlines[1] == [(1, 'Intro')]
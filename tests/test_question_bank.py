@@ -0,0 +1,34 @@
+import TESTE2
+
+
+def _document(db, title):
+    document_id = db.save_document(title, f"{title}.pdf")
+    db.save_content_stream(document_id, [
+        {'chapter': title, 'theme': None, 'subtheme': None, 'page': 1, 'text': title}
+    ])
+    content_id = db.conn.execute('SELECT id FROM content WHERE document_id = ?', (document_id,)).fetchone()[0]
+    return document_id, content_id
+
+
+def _questions(db, content_id, count):
+    db.save_questions([
+        (content_id, {'type': 'short_answer', 'question': f"Pergunta {i}?", 'answer': "resposta"})
+        for i in range(count)
+    ])
+
+
+def test_sample_fills_the_quota_when_stratum_ids_are_clustered(tmp_path):
+    db = TESTE2.DatabaseManager(str(tmp_path / "db.sqlite"))
+    first, first_content = _document(db, "A")
+    _, other_content = _document(db, "B")
+
+    # Ids do documento A: um bloco no início e uma questão isolada depois de muitas de B
+    _questions(db, first_content, 600)
+    _questions(db, other_content, 5000)
+    _questions(db, first_content, 1)
+
+    for count in (20, 50, 100):
+        questions = db.sample_questions(count, document_id=first)
+        assert len(questions) == count
+        assert len({question['id'] for question in questions}) == count
+        assert {question['chapter'] for question in questions} == {"A"}
@@ -0,0 +1,22 @@
+import TESTE2
+
+
+def test_multiple_choice_distractors_come_from_the_document():
+    sentences = [f"A afirmação número {i} trata de um tema diferente do texto." for i in range(20)]
+    pool = TESTE2.DistractorPool(sentences)
+    quiz = TESTE2.QuizGenerator(seed=1)
+
+    for index in range(len(sentences) - 1):
+        question = quiz._generate_multiple_choice(sentences, index, pool)
+        assert len(question['options']) == 4
+        assert question['answer'] == sentences[index + 1]
+        assert set(question['options']) <= set(sentences) - {sentences[index]}
+
+
+def test_multiple_choice_falls_back_to_modified_sentence_on_small_documents():
+    sentences = ["O aumento foi grande.", "O resultado foi positivo.", "A meta era certa.", "O plano deu certo."]
+    quiz = TESTE2.QuizGenerator(seed=1)
+
+    question = quiz._generate_multiple_choice(sentences, 0, TESTE2.DistractorPool(sentences))
+    assert len(question['options']) == 4
+    assert question['answer'] in question['options']
@@ -0,0 +1,17 @@
+import TESTE2
+
+
+def test_document_tokens_include_blocks_not_yet_tokenized(tmp_path):
+    db = TESTE2.DatabaseManager(str(tmp_path / "db.sqlite"))
+    document_id = db.save_document("doc", "doc.pdf")
+    db.save_content_stream(document_id, [
+        {'chapter': None, 'theme': None, 'subtheme': None, 'page': page, 'text': f"Frase da página {page}."}
+        for page in range(1, 4)
+    ])
+    content_ids = [row[0] for row in db.conn.execute('SELECT id FROM content ORDER BY id')]
+
+    db.get_tokenized_content(content_ids[1])
+    tokens = db.get_tokenized_document(document_id)
+
+    assert tokens.content_ids.tolist() == content_ids
+    assert tokens.sentences == [f"Frase da página {page}." for page in range(1, 4)]